@@ -0,0 +1,263 @@
+#----------------
+# Benchmark suite for the controllers, obstacles, planner, fleet, rendering and standard courses
+# Runs headless (SDL dummy video driver), writes results as JSON and compares them against a
+# stored baseline, flagging anything that got worse by more than the tolerance
+#   python -m benchmarks.run --save-baseline      record benchmarks/baseline.json
+#   python -m benchmarks.run                      compare against it (exit code 1 on regressions)
+# Timings are the best of several repeats, course times are simulated seconds and deterministic
+# Only the deterministic metrics fail the run: timings vary by more than the tolerance between runs on
+# the same idle machine, so a slower timing is printed as a warning (--strict fails on those too)
+# Timings only compare on the machine that recorded them, the committed baseline.json names its machine
+# in "meta". Refresh it with --save-baseline on your own machine before comparing, and commit a new one
+# with any change that is meant to move the numbers (or adds or renames a benchmark)
+#----------------
+
+import argparse
+import json
+import math
+import os
+import platform
+import sys
+import time
+
+os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+
+import numpy as np
+
+from tracking.batch import BatchSimulator
+from tracking.controllers import model_predictive, move_robot_with_pid, pure_pursuit
+from tracking.fleet import Fleet, SpatialHash
+from tracking.obstacles import ObstacleMap, load_obstacles
+from tracking.mpc import MPPIController
+from tracking.path import Path
+from tracking.planner import PlanningGrid, SlicedPlanner, astar
+from tracking.sweep import DEFAULT_SCENARIOS, run_scenario
+
+BASELINE = os.path.join(os.path.dirname(__file__), "baseline.json")
+FIELD = os.path.join(os.path.dirname(__file__), "..", "fields", "example.json")
+DETERMINISTIC_UNITS = ("sim s",)  # Units of the metrics that come out the same on every run
+
+# Best seconds per call of fn over `repeats` runs of `number` calls
+# The minimum is the least disturbed by whatever else the machine is doing
+def measure(fn, number, repeats=7):
+    times = []
+    for _ in range(repeats):
+        start = time.perf_counter()
+        for _ in range(number):
+            fn()
+        times.append((time.perf_counter() - start) / number)
+    return min(times)
+
+def bench_controller_steps():
+    results = {}
+    pos, angle = [100.0, 100.0], 0.0
+
+    def pid_step():
+        pos[0], pos[1] = 100.0, 100.0
+        move_robot_with_pid(pos, (900, 500), angle, 2, 0.05)
+    results["move_robot_with_pid_step"] = (measure(pid_step, 20000) * 1e6, "us", "lower")
+
+    for points in (3, 5000):
+        t = np.linspace(0, 4 * math.pi, points)
+        path = Path(np.column_stack([100 + t * 60, 325 + 200 * np.sin(t)]))
+        state = {"pos": [100.0, 325.0], "angle": 0.0}
+
+        def pursuit_step():
+            if path.finished(state["pos"], 5) or state["pos"][0] > 900:
+                path.reset()
+                state["pos"], state["angle"] = [100.0, 325.0], 0.0
+            _, state["angle"], _ = pure_pursuit(state["pos"], path, 50, state["angle"], 2)
+        results[f"pure_pursuit_step_{points}_points"] = (measure(pursuit_step, 5000) * 1e6, "us", "lower")
+
+    # MPPI solve on the dense path, 256 samples over a 30 tick horizon
+    controller = MPPIController(max_speed=2)
+    state = {"pos": [100.0, 325.0], "angle": 0.0}
+
+    def mpc_step():
+        if path.finished(state["pos"], 5) or state["pos"][0] > 900:
+            path.reset()
+            controller.reset()
+            state["pos"], state["angle"] = [100.0, 325.0], 0.0
+        _, state["angle"], _ = model_predictive(state["pos"], path, state["angle"], controller)
+    results["mpc_step"] = (measure(mpc_step, 200) * 1e6, "us", "lower")
+    return results
+
+def bench_batch():
+    results = {}
+    rng = np.random.default_rng(0)
+    for n in (1, 100, 10000):
+        sim = BatchSimulator(rng.uniform(0, 1000, n), rng.uniform(0, 650, n), rng.uniform(-math.pi, math.pi, n))
+        # Targets far away so nobody arrives during the measurement
+        sim.set_targets(rng.uniform(5000, 6000, n), rng.uniform(5000, 6000, n))
+        results[f"batch_robot_ticks_per_s_{n}"] = (n / measure(sim.step, 200), "robot-ticks/s", "higher")
+    return results
+
+def bench_obstacles():
+    results = {}
+    start = time.perf_counter()
+    field = ObstacleMap(load_obstacles(FIELD))
+    results["obstacle_map_build_ms"] = ((time.perf_counter() - start) * 1e3, "ms", "lower")
+    rng = np.random.default_rng(0)
+    results["collides_scalar_us"] = (measure(lambda: field.collides(500, 100, 503, 104, 10), 2000) * 1e6, "us", "lower")
+    for n in (500, 10000):
+        x, y = rng.uniform(0, 1000, n), rng.uniform(0, 650, n)
+        heading = rng.uniform(-math.pi, math.pi, n)
+        x1, y1 = x + 5 * np.cos(heading), y + 5 * np.sin(heading)
+        results[f"swept_collision_us_{n}_robots"] = (
+            measure(lambda: field.swept_collision(x, y, x1, y1, 10), 20) * 1e6, "us", "lower")
+    angles = np.linspace(-math.pi, math.pi, 360, endpoint=False)
+    results["raycast_us_360_rays"] = (measure(lambda: field.raycast(150.0, 325.0, angles), 20) * 1e6, "us", "lower")
+    return results
+
+# Routes across the example field: one-shot A* and jump point search, and the longest frame slice of
+# the window's planner, which has to stay near its budget
+def bench_planner():
+    results = {}
+    field = ObstacleMap(load_obstacles(FIELD))
+    grid = PlanningGrid(field)
+    start, goal = grid.cell((100, 325)), grid.cell((920, 600))
+    results["astar_ms"] = (measure(lambda: astar(grid, start, goal), 3) * 1e3, "ms", "lower")
+    results["jump_point_search_ms"] = (measure(lambda: astar(grid, start, goal, jump_points=True), 3) * 1e3, "ms", "lower")
+
+    def longest_slice():
+        planner = SlicedPlanner(field)
+        planner.set_goal((100, 325), (920, 600))
+        longest = 0.0
+        done = False
+        while not done:
+            begin = time.perf_counter()
+            done = planner.compute(0.004)
+            longest = max(longest, time.perf_counter() - begin)
+        return longest
+    results["planner_slice_ms"] = (min(longest_slice() for _ in range(3)) * 1e3, "ms", "lower")
+    return results
+
+# Multi-robot scene: a fleet tick, its contact query and drawing it from the sprite cache
+def bench_fleet():
+    import pygame
+
+    from tracking.widgets import RobotSprites
+
+    pygame.init()
+    screen = pygame.display.set_mode((1000, 800))
+    results = {}
+    fleet = Fleet(500)
+    for _ in range(60):
+        fleet.step()
+    grid = SpatialHash(4 * fleet.radius)
+    results["fleet_contacts_us_500_robots"] = (
+        measure(lambda: grid.pairs(fleet.x, fleet.y, 2 * fleet.radius), 50) * 1e6, "us", "lower")
+    results["fleet_tick_ms_500_robots"] = (measure(fleet.step, 20) * 1e3, "ms", "lower")
+    sprites = RobotSprites(2 * fleet.radius)
+    results["fleet_draw_ms_500_robots"] = (
+        measure(lambda: sprites.draw(screen, fleet.x, fleet.y, fleet.heading), 50) * 1e3, "ms", "lower")
+    pygame.quit()
+    return results
+
+# One representative window frame: sync the cached trajectory layer, draw waypoints, robot and HUD
+def bench_rendering():
+    import pygame
+
+    from tracking.render import DirtyScreen, TrajectoryLayer
+    from tracking.text import TextRenderer
+    from tracking.trajectory import TrajectoryStore
+
+    pygame.init()
+    screen = pygame.display.set_mode((1000, 800))
+    text = TextRenderer()
+    rng = np.random.default_rng(0)
+    results = {}
+    for trajectories in (0, 100, 1000):
+        for waypoints in (0, 50, 500):
+            store = TrajectoryStore()
+            for _ in range(trajectories):
+                for point in np.cumsum(rng.normal(0, 3, (200, 2)), axis=0) + rng.uniform(100, 600, 2):
+                    store.append(point)
+                store.finish()
+            points = rng.uniform(0, 650, (waypoints, 2)).tolist()
+            frame = DirtyScreen(screen, TrajectoryLayer((1000, 800)))
+            state = {"tick": 0}
+
+            def draw_frame():
+                state["tick"] += 1
+                x, y = 200 + state["tick"] % 600, 300.0
+                store.append((x, y + (state["tick"] % 7)))
+                frame.begin(store)
+                if len(points) > 1:
+                    frame.add(pygame.draw.lines(screen, (255, 0, 0), False, points, 2))
+                frame.add(pygame.draw.rect(screen, (0, 0, 255), pygame.Rect(x - 10, y - 10, 20, 20)))
+                frame.add(text.draw_readout(screen, "Robot: ", f"{x:.1f}, {y:.1f}", (10, 10)))
+                frame.finish()
+            draw_frame()  # First frame builds the cached background
+            results[f"frame_ms_{trajectories}_trajectories_{waypoints}_waypoints"] = (
+                measure(draw_frame, 50) * 1e3, "ms", "lower")
+    pygame.quit()
+    return results
+
+def bench_courses():
+    results = {}
+    for scenario in DEFAULT_SCENARIOS:
+        outcome = run_scenario(scenario, {})
+        value = outcome["time"] if outcome["completed"] else math.inf
+        results[f"course_time_{scenario['name']}"] = (value, "sim s", "lower")
+    return results
+
+def run_all():
+    results = {}
+    for bench in (bench_controller_steps, bench_batch, bench_obstacles, bench_planner, bench_fleet, bench_rendering,
+                  bench_courses):
+        results.update(bench())
+    return {
+        "meta": {"python": sys.version.split()[0], "numpy": np.__version__, "platform": platform.platform(),
+                 "time": time.strftime("%Y-%m-%dT%H:%M:%S")},
+        "results": {name: {"value": value, "unit": unit, "better": better}
+                    for name, (value, unit, better) in results.items()},
+    }
+
+# Metrics that got worse than the baseline by more than tolerance (a fraction)
+def compare(current, baseline, tolerance):
+    regressions = []
+    for name, result in current["results"].items():
+        if name not in baseline["results"]:
+            continue
+        old, new = baseline["results"][name]["value"], result["value"]
+        change = (new - old) / old if old else 0.0
+        if result["better"] == "higher":
+            change = -change
+        if change > tolerance:
+            regressions.append((name, old, new, change))
+    return regressions
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the benchmark suite")
+    parser.add_argument("--out", default="benchmark_results.json", help="where to write this run's results")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline results to compare against")
+    parser.add_argument("--save-baseline", action="store_true", help="store this run as the baseline")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown before flagging, as a fraction")
+    parser.add_argument("--strict", action="store_true", help="fail on slower timings too, not only on course times")
+    args = parser.parse_args()
+
+    current = run_all()
+    with open(args.out, "w") as f:
+        json.dump(current, f, indent=2)
+    for name, result in current["results"].items():
+        print(f"{name:<55} {result['value']:>14.4g} {result['unit']}")
+
+    if args.save_baseline:
+        with open(args.baseline, "w") as f:
+            json.dump(current, f, indent=2)
+        print(f"Saved baseline to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as f:
+            regressions = compare(current, json.load(f), args.tolerance)
+        failed = False
+        for name, old, new, change in regressions:
+            gated = args.strict or current["results"][name]["unit"] in DETERMINISTIC_UNITS
+            failed |= gated
+            print(f"{'REGRESSION' if gated else 'slower    '} {name}: {old:.4g} -> {new:.4g} ({change:+.0%} worse)")
+        if failed:
+            raise SystemExit(1)
+        print("No regressions against the baseline" + (", timings above may be noise" if regressions else ""))
+    else:
+        print(f"No baseline at {args.baseline}, run with --save-baseline to create one")
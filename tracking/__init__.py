@@ -0,0 +1,4 @@
+#----------------
+# Shared, importable pieces of the localization and pure pursuit tool
+# Nothing in here opens a window, so it can be used headless
+#----------------
@@ -0,0 +1,368 @@
+#----------------
+# Window front-end shared by main.py (moveToPoint and pure pursuit) and trackingOnly.py (moveToPoint only)
+# pygame and the drawing modules are imported when an App is created, so importing this module, or
+# anything else in tracking, from a headless worker or benchmark never loads SDL or opens a window
+#----------------
+
+import argparse
+import math
+
+from tracking.fleet import Fleet
+from tracking.obstacles import ObstacleMap, load_obstacles
+from tracking.planner import SlicedPlanner
+from tracking.profiler import IDLE, Profiler, ProfilerOverlay
+from tracking.replay import LogWriter
+from tracking.simulation import Simulation
+from tracking.telemetry import DEFAULT_ADDRESS, TelemetryServer, apply_command
+from tracking.timestep import FixedTimestep
+
+BLACK = (0, 0, 0)
+
+# Set up display
+WIDTH, HEIGHT = 1000, 800  # Window dimensions
+SLIDER_AREA_HEIGHT = 150  # Define the area for sliders at the bottom
+
+# Robot properties
+ROBOT_SPEED = 2  # Default speed of the robot
+PURSUIT_TOP_SPEED = 5  # Pure pursuit speed on straights, the smoothed path slows it down for curves
+DEFAULT_TURN_SPEED = 0.05  # Default turning speed for regular movements
+LOOKAHEAD_DISTANCE = 50  # Distance for Pure Pursuit lookahead
+FINAL_POINT_TOLERANCE = 5  # Tolerance for stopping at the final point
+MAX_ACCEL = 0.1  # Largest change in speed per tick, so runs take as long as on a real drivetrain
+DRAG_HEADING_DISTANCE = 15  # Dragging a click further than this sets the final heading
+PLANNER_BUDGET = 0.004  # Seconds of each frame the route planner may use, a search that needs more carries over
+
+class App:
+    def __init__(self, args, pure_pursuit=True):
+        import pygame
+
+        from tracking.render import DirtyScreen, TrajectoryLayer
+        from tracking.text import TextRenderer
+        from tracking.widgets import WHITE, Button, RobotSprites, Slider, draw_obstacles
+
+        self.pure_pursuit = pure_pursuit  # False for the moveToPoint only tool
+        self.title = ("Localization and Pure Pursuit Visualization Tool" if pure_pursuit
+                      else "Localization Visualization Tool")
+
+        # Initialize Pygame
+        pygame.init()
+        self.screen = pygame.display.set_mode((WIDTH, HEIGHT))
+        pygame.display.set_caption(self.title)
+
+        # Simulation state (robot pose, targets, waypoints and paths), advanced at a fixed timestep
+        # With --particles the pose is also estimated from noisy sensors, --drive-estimate steers from that estimate
+        localization = dict(particles=args.particles) if args.particles else None
+        self.sim = Simulation([WIDTH // 2, (HEIGHT - SLIDER_AREA_HEIGHT) // 2], 0, ROBOT_SPEED, DEFAULT_TURN_SPEED,
+                              PURSUIT_TOP_SPEED, LOOKAHEAD_DISTANCE, FINAL_POINT_TOLERANCE, max_accel=MAX_ACCEL,
+                              localization=localization, drive_on_estimate=args.drive_estimate,
+                              obstacles=load_obstacles(args.obstacles) if args.obstacles else None,
+                              mpc={} if args.mpc else None)
+        self.clock = FixedTimestep(args.speed)
+        # Optional crowd of robots driving around on their own, drawn from a sprite cache
+        self.fleet = None
+        if args.robots:
+            self.fleet = Fleet(args.robots, obstacles=self.sim.obstacles)
+            self.fleet_sprites = RobotSprites(2 * self.fleet.radius)
+        if args.record:
+            self.sim.recorder = LogWriter(args.record, self.sim.config)
+        # Obstacles never change, so they are drawn once under the trajectories on the cached background
+        underlay = None
+        if self.sim.obstacles is not None:
+            underlay = pygame.Surface((WIDTH, HEIGHT))
+            underlay.fill(WHITE)
+            draw_obstacles(underlay, self.sim.obstacles.shapes)
+        self.frame = DirtyScreen(self.screen, TrajectoryLayer((WIDTH, HEIGHT), WHITE, BLACK, underlay))
+        self.text = TextRenderer()  # Fonts and rendered text are cached instead of rebuilt every frame
+        self.profiler = Profiler(enabled=args.profile or bool(args.profile_out))
+        self.profiler_overlay = ProfilerOverlay(self.profiler, self.text, (WIDTH - 310, 10))
+        self.profile_out = args.profile_out
+        # Optional telemetry server streaming the state to other tools and taking commands from them
+        self.telemetry = TelemetryServer(args.telemetry).start() if args.telemetry else None
+
+        # Initialize sliders
+        self.speed_slider = Slider(50, HEIGHT - 130, 300, 1, 5, 2, "Movement Speed", self.text)  # Positioned higher
+        self.turn_slider = Slider(50, HEIGHT - 80, 300, 0.01, 0.1, DEFAULT_TURN_SPEED, "Turn Speed", self.text)  # Positioned lower
+
+        # Initialize reset button, the moveToPoint only tool just clears the saved trajectories
+        self.reset_button = Button(700, HEIGHT - 100, 150, 40, "Reset Trajectories" if pure_pursuit else "Clear",
+                                   self.text)
+        self.mouse_pos = (0, 0)
+        self.drag_start = None  # Where a left click went down, the target is set when it comes up
+        self.running = True
+
+        # Route planner for right clicks, built on the first one (the planning grid costs a few ms)
+        self.planner = None
+        self.plan_status = None
+        self.plan_time = 0.0
+
+    # Function to display text on the screen
+    # A value that changes every frame is passed separately and drawn from cached digit glyphs
+    def display_text(self, label, pos, color=BLACK, value=None):
+        if value is None:
+            return self.text.draw(self.screen, label, pos, color)
+        return self.text.draw_readout(self.screen, label, value, pos, color)
+
+    def handle_events(self):
+        import pygame
+
+        sim = self.sim
+        # Get the current mouse position (cursor)
+        self.mouse_pos = pygame.mouse.get_pos()
+
+        for event in pygame.event.get():
+            if event.type == pygame.QUIT:
+                self.running = False
+            elif (self.pure_pursuit and event.type == pygame.MOUSEBUTTONDOWN and event.button == 3
+                  and event.pos[1] < HEIGHT - SLIDER_AREA_HEIGHT):
+                self.plan_to(event.pos)  # Plan a collision-free route to the clicked point
+            elif event.type == pygame.MOUSEBUTTONDOWN and event.button == 1:
+                if self.pure_pursuit and pygame.key.get_mods() & pygame.KMOD_SHIFT:  # Check if Shift is held
+                    sim.add_waypoint(pygame.mouse.get_pos())  # Add waypoint for Pure Pursuit
+                elif event.pos[1] < HEIGHT - SLIDER_AREA_HEIGHT:  # Check if the click is outside the slider area
+                    self.drag_start = event.pos
+            elif event.type == pygame.MOUSEBUTTONUP and event.button == 1 and self.drag_start is not None:
+                # A plain click is a moveToPoint target, dragging away from it also sets the heading
+                # to finish on (the angle enforcement variant)
+                start, self.drag_start = self.drag_start, None
+                end = event.pos
+                if math.dist(start, end) > DRAG_HEADING_DISTANCE:
+                    sim.set_target(start, math.atan2(end[1] - start[1], end[0] - start[0]))
+                else:
+                    sim.set_target(start)
+
+            # Check for reset button click
+            if self.reset_button.is_clicked(event):
+                if self.pure_pursuit:
+                    sim.reset()
+                else:
+                    sim.paths.clear_saved()  # Clear all trajectories
+
+            # Pass events to the sliders
+            self.speed_slider.handle_event(event)
+            self.turn_slider.handle_event(event)
+
+            # Start Pure Pursuit after Enter key is pressed
+            if self.pure_pursuit and event.type == pygame.KEYDOWN and event.key == pygame.K_RETURN:
+                sim.start_pure_pursuit()
+
+            # Toggle the profiler overlay with F3
+            if event.type == pygame.KEYDOWN and event.key == pygame.K_F3:
+                self.profiler.toggle()
+
+    # Start planning a route to goal from the last waypoint, or from the robot when there are none
+    def plan_to(self, goal):
+        if self.sim.pure_pursuit_active:
+            return
+        if self.planner is None:
+            field = self.sim.obstacles if self.sim.obstacles is not None else ObstacleMap()
+            self.planner = SlicedPlanner(field, radius=self.sim.robot_radius)
+        start = self.sim.pure_pursuit_points[-1] if self.sim.pure_pursuit_points else self.sim.robot_pos
+        if self.planner.set_goal(start, goal):
+            self.plan_status = "planning"
+            self.plan_time = 0.0
+        else:
+            self.plan_status = "no route"
+
+    # Give the planner its slice of the frame, and once it is done follow the route it found
+    def update_planner(self):
+        import time
+
+        if self.planner is None or not self.planner.pending:
+            return
+        start = time.perf_counter()
+        done = self.planner.compute(PLANNER_BUDGET)
+        self.plan_time += time.perf_counter() - start
+        if not done:
+            return
+        waypoints = self.planner.waypoints()
+        if waypoints is None:
+            self.plan_status = "no route"
+            return
+        for point in waypoints:
+            self.sim.add_waypoint((round(point[0]), round(point[1])))
+        self.sim.start_pure_pursuit()
+        self.plan_status = f"{len(waypoints)} waypoints in {self.plan_time * 1000:.1f}ms"
+
+    # One fixed tick of the robot and the fleet, the fleet never runs out of things to do
+    def step(self):
+        self.sim.step()
+        self.fleet.step()
+
+    # Saved trajectories and the current path live on a cached background, only new segments get drawn
+    def draw_field(self):
+        import pygame
+
+        from tracking.widgets import GRAY, RED, draw_estimate, draw_particles, draw_robot
+
+        sim, screen, frame = self.sim, self.screen, self.frame
+        frame.begin(sim.paths)
+
+        if self.pure_pursuit:
+            # Draw pure pursuit points and paths
+            if len(sim.pure_pursuit_points) > 1:
+                frame.add(pygame.draw.lines(screen, RED, False, sim.pure_pursuit_points, 2))
+
+            # Draw the smoothed path pure pursuit is following
+            if sim.pure_pursuit_path is not None and len(sim.pure_pursuit_path) > 1:
+                frame.add(pygame.draw.lines(screen, GRAY, False, sim.pure_pursuit_path.points.tolist(), 1))
+
+        # Draw initial position and heading line
+        if sim.target_pos:
+            frame.add(pygame.draw.circle(screen, BLACK, sim.initial_pos, 5))
+            initial_end_pos = (
+                sim.initial_pos[0] + 30 * math.cos(sim.initial_angle),
+                sim.initial_pos[1] + 30 * math.sin(sim.initial_angle)
+            )
+            frame.add(pygame.draw.line(screen, BLACK, sim.initial_pos, initial_end_pos, 2))
+
+        # Draw a sample of the particles and the estimated pose under the robot
+        if sim.localizer:
+            frame.add(draw_particles(screen, sim.localizer.filter.x, sim.localizer.filter.y))
+            frame.add(draw_estimate(screen, sim.localizer.estimate))
+
+        # Draw the fleet under the robot
+        if self.fleet is not None:
+            frame.add(self.fleet_sprites.draw(screen, self.fleet.x, self.fleet.y, self.fleet.heading))
+
+        # Draw robot and its direction
+        frame.add(draw_robot(screen, sim.robot_pos, sim.robot_angle))
+
+        # Draw the target point, with its final heading and approach point for the angle enforcement variant
+        if sim.target_pos:
+            frame.add(pygame.draw.circle(screen, RED, sim.target_pos, 5))
+            if sim.target_heading is not None:
+                heading_end = (sim.target_pos[0] + 30 * math.cos(sim.target_heading),
+                               sim.target_pos[1] + 30 * math.sin(sim.target_heading))
+                frame.add(pygame.draw.line(screen, RED, sim.target_pos, heading_end, 2))
+            if sim.approach_pos is not None:
+                frame.add(pygame.draw.circle(screen, RED, sim.approach_pos, 4, 1))
+
+        # Draw the heading being dragged out for a new target
+        if self.drag_start is not None:
+            frame.add(pygame.draw.line(screen, GRAY, self.drag_start, self.mouse_pos, 1))
+
+    def draw_hud(self):
+        sim, frame, mouse_pos = self.sim, self.frame, self.mouse_pos
+
+        # Display coordinates of the robot, target, and mouse cursor
+        frame.add(self.display_text("Robot: ", (10, 10), value=f"{sim.robot_pos[0]:.1f}, {sim.robot_pos[1]:.1f}"))
+        if sim.target_pos:
+            frame.add(self.display_text("Target: ", (10, 40), value=f"{sim.target_pos[0]:.1f}, {sim.target_pos[1]:.1f}"))
+        frame.add(self.display_text("Cursor: ", (10, 70), value=f"{mouse_pos[0]:.1f}, {mouse_pos[1]:.1f}"))
+        frame.add(self.display_text("Sim time: ", (10, 100), value=f"{sim.sim_time:.2f}s"))
+        if sim.last_run_time is not None:
+            frame.add(self.display_text("Last run: ", (10, 130), value=f"{sim.last_run_time:.2f}s"))
+        if sim.localizer:
+            estimate = sim.localizer.estimate
+            frame.add(self.display_text("Estimate: ", (10, 190), value=f"{estimate[0]:.1f}, {estimate[1]:.1f}"))
+            frame.add(self.display_text("Estimate error: ", (10, 220), value=f"{sim.localizer.error(sim.robot_pos):.2f}"))
+        if sim.collisions:
+            frame.add(self.display_text("Collisions: ", (10, 250), value=f"{sim.collisions}"))
+        if self.fleet is not None:
+            frame.add(self.display_text("Robots: ", (10, 340), value=f"{len(self.fleet)}, {self.fleet.contacts} contacts"))
+        if self.pure_pursuit:
+            if sim.pure_pursuit_active and sim.planned_time is not None:
+                frame.add(self.display_text("Planned: ", (10, 160), value=f"{sim.planned_time:.2f}s"))
+            if self.plan_status:
+                frame.add(self.display_text(f"Route: {self.plan_status}", (10, 280)))
+            if sim.mpc is not None and sim.mpc.solve_times.added:
+                times = sim.mpc.solve_times
+                frame.add(self.display_text("MPC solve ms: ", (10, 310),
+                                            value=f"{sim.mpc.last_solve_time:.2f}, p95 {times.percentile(95):.2f}"))
+
+            # Display instructions at the bottom of the screen
+            frame.add(self.display_text("Hold shift and click to enter pure pursuit points, press enter to run, "
+                                        "right click to plan a route", (10, HEIGHT - 40)))
+        frame.add(self.display_text("Click to move to a point, drag from it to also set the heading to finish on",
+                                    (10, HEIGHT - 20 if self.pure_pursuit else HEIGHT - 40)))
+
+        # Draw sliders
+        frame.add(self.speed_slider.draw(self.screen))
+        frame.add(self.turn_slider.draw(self.screen))
+
+        # Draw reset button
+        frame.add(self.reset_button.draw(self.screen))
+
+    # Main loop, one rendered frame per pass with the profiler marking each phase
+    def run(self):
+        import pygame
+
+        profiler = self.profiler
+        while self.running:
+            profiler.start_frame()
+            self.handle_events()
+            if self.telemetry:
+                for command in self.telemetry.commands():
+                    apply_command(self.sim, command, self.pure_pursuit)
+            profiler.mark("events")
+            self.update_planner()
+            profiler.mark("planner")
+
+            # Advance the simulation by however many fixed ticks are due this frame
+            self.sim.speed = self.speed_slider.value
+            self.sim.turn_speed = self.turn_slider.value
+            self.clock.frame(self.sim.step if self.fleet is None else self.step, wait=False)
+            profiler.mark("step")
+            if self.telemetry:
+                self.telemetry.publish(self.sim)
+                profiler.mark("telemetry")
+
+            # Render the latest state once per frame
+            self.draw_field()
+            profiler.mark("trajectories")
+            self.draw_hud()
+            profiler.mark("hud")
+
+            # Draw the profiler overlay, if it is on
+            self.frame.add(self.profiler_overlay.draw(self.screen))
+            profiler.mark("overlay")
+
+            # Update only the changed areas of the display
+            self.frame.finish()
+            profiler.mark("display")
+
+            # Wait for the next frame
+            self.clock.wait()
+            profiler.mark(IDLE)
+            profiler.end_frame()
+
+        # Finish the log and profile and quit Pygame
+        if self.sim.recorder:
+            self.sim.recorder.close()
+        if self.profile_out:
+            self.profiler.export(self.profile_out)
+        if self.telemetry:
+            self.telemetry.stop()
+        pygame.quit()
+
+
+def parse_args(description, argv=None, pure_pursuit=True):
+    parser = argparse.ArgumentParser(description=description)
+    parser.add_argument("--speed", type=float, default=1, help="simulation speed multiplier, 0 runs as fast as possible")
+    parser.add_argument("--record", metavar="FILE", help="log every tick to FILE for replay")
+    parser.add_argument("--profile", action="store_true", help="start with the frame profiler overlay on")
+    parser.add_argument("--profile-out", metavar="FILE", help="write the frame profile to FILE as JSON at exit")
+    parser.add_argument("--particles", type=int, default=0,
+                        help="estimate the pose with a particle filter of this many particles, e.g. 10000 "
+                             "(default 0, no localization)")
+    parser.add_argument("--obstacles", metavar="FILE", help="obstacle JSON file, e.g. fields/example.json")
+    parser.add_argument("--drive-estimate", action="store_true",
+                        help="steer the controllers from the estimated pose instead of the true one")
+    parser.add_argument("--telemetry", metavar="ADDRESS", nargs="?", const=DEFAULT_ADDRESS,
+                        help=f"serve telemetry on host:port or unix:/path (default {DEFAULT_ADDRESS}), "
+                             "see python -m tracking.telemetry")
+    parser.add_argument("--mpc", action="store_true",
+                        help="follow pure pursuit paths with the MPPI model predictive controller")
+    parser.add_argument("--robots", type=int, default=0, metavar="N",
+                        help="add N more robots driving to random targets and courses of their own")
+    args = parser.parse_args(argv)
+    if args.drive_estimate and not args.particles:
+        parser.error("--drive-estimate needs localization, turn it on with --particles N")
+    if args.mpc and not pure_pursuit:
+        parser.error("--mpc follows pure pursuit paths, which this tool doesn't have, run main.py instead")
+    return args
+
+# Parse the command line and run the window until it is closed
+def main(pure_pursuit=True, argv=None):
+    description = "Localization and Pure Pursuit Visualization Tool" if pure_pursuit else "Localization Visualization Tool"
+    App(parse_args(description, argv, pure_pursuit), pure_pursuit).run()
@@ -0,0 +1,203 @@
+#----------------
+# moveToPoint angle enforcement: to finish facing a given heading, the robot first drives to an
+# approach point set back from the target along that heading, then to the target itself, so its
+# last stretch is already lined up
+# How far back the approach point goes depends on how far the robot has to swing round (the
+# approach angle between its bearing to the target and the final heading), its speed and its turn
+# rate. That is worked out once for a grid of all three by driving every combination, with every
+# candidate offset, through tracking.batch.BatchSimulator in one batch, and looked up by
+# interpolating the table instead of being solved every time a target is set
+# The table is built the first time a heading is asked for and saved under .approach_cache/, keyed by the
+# controller settings, the grid and the source of the code that drives the runs, so later processes load
+# it instead of building it again
+# Run `python -m tracking.approach` to build the table and compare time-to-pose and final heading
+# error against the performance variant
+#----------------
+
+import bisect
+from concurrent.futures import Future
+import hashlib
+import math
+import os
+import threading
+
+import numpy as np
+
+from tracking.batch import BatchSimulator
+from tracking.controllers import TARGET_RADIUS, TURN_THRESHOLD
+
+ANGLES = tuple(math.radians(a) for a in range(0, 181, 15))  # Approach angle, mirrored for the other side
+SPEEDS = (1, 2, 3, 4, 5)
+TURN_SPEEDS = (0.01, 0.025, 0.05, 0.075, 0.1)
+OFFSETS = tuple(range(0, 601, 25))  # Candidate distances from the target to the approach point
+START_DISTANCE = 300  # How far from the target the table's runs start
+# Final heading error that counts as on heading, moveToPoint stops turning inside its 10 degree
+# threshold so it can't do much better
+HEADING_TOLERANCE = math.radians(15)
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+CACHE_DIR = os.path.join(PACKAGE_DIR, "..", ".approach_cache")
+
+# The approach point counts as reached within the robot's turning radius (speed / turn speed): it
+# can't reliably get closer than that, and aiming closer makes it circle the point
+def approach_radius(speed, turn_speed, target_radius=TARGET_RADIUS):
+    return max(target_radius, speed / turn_speed)
+
+def wrap_angle(angle):
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+# Approach point for a target and final heading, `offset` back from the target
+def approach_point(target, heading, offset):
+    return (target[0] - offset * math.cos(heading), target[1] - offset * math.sin(heading))
+
+# Approach angle of a robot at pos: how far the final heading is from its bearing to the target
+def approach_angle(pos, target, heading):
+    bearing = math.atan2(target[1] - pos[1], target[0] - pos[0])
+    return abs(wrap_angle(heading - bearing))
+
+
+class ApproachTable:
+    # offsets[a, s, t] is the approach point distance for ANGLES[a], SPEEDS[s], TURN_SPEEDS[t]
+    def __init__(self, offsets, heading_errors, ticks):
+        self.offsets = offsets
+        self.heading_errors = heading_errors  # Final heading error the chosen offset gave
+        self.ticks = ticks  # Ticks it took
+
+    # Drive every (angle, speed, turn speed, offset) combination from START_DISTANCE away, facing
+    # the target, to its approach point and then to the target, all in one BatchSimulator
+    # For each (angle, speed, turn speed) keep the fastest offset that ends within HEADING_TOLERANCE,
+    # or the one with the smallest heading error when none do
+    @classmethod
+    def build(cls, turn_threshold=TURN_THRESHOLD, target_radius=TARGET_RADIUS, max_ticks=3000):
+        angle, speed, turn, offset = (a.ravel() for a in np.meshgrid(ANGLES, SPEEDS, TURN_SPEEDS, OFFSETS,
+                                                                      indexing="ij"))
+        n = len(angle)
+        target_x, target_y = START_DISTANCE, 0.0
+        sim = BatchSimulator(np.zeros(n), np.zeros(n), np.zeros(n), speed=speed, turn_speed=turn,
+                             turn_threshold=turn_threshold, target_radius=np.maximum(target_radius, speed / turn))
+        sim.set_targets(target_x - offset * np.cos(angle), target_y - offset * np.sin(angle))
+        first_leg = sim.run(max_ticks).copy()
+        made_it = sim.reached.copy()
+        sim.target_radius = np.broadcast_to(np.asarray(target_radius, dtype=np.float64), (n,))
+        sim.set_targets(target_x, target_y)
+        total = first_leg + sim.run(max_ticks)
+        made_it &= sim.reached
+
+        error = np.abs(np.mod(sim.heading - angle + math.pi, 2 * math.pi) - math.pi)
+        shape = (len(ANGLES), len(SPEEDS), len(TURN_SPEEDS), len(OFFSETS))
+        error = np.where(made_it, error, math.inf).reshape(shape)
+        total = np.where(made_it, total, np.iinfo(np.int64).max).reshape(shape)
+        # Rank by ticks among the offsets within tolerance, then by heading error
+        within = error <= HEADING_TOLERANCE
+        score = np.where(within, total.astype(np.float64), 1e12 + error)
+        best = np.argmin(score, axis=-1)[..., None]
+        return cls(np.asarray(OFFSETS, dtype=np.float64)[best[..., 0]],
+                   np.take_along_axis(error, best, -1)[..., 0], np.take_along_axis(total, best, -1)[..., 0])
+
+    # Approach point distance for any approach angle, speed and turn speed, interpolated between
+    # the grid points (values off the grid use the nearest edge)
+    def offset(self, angle, speed, turn_speed):
+        corners = [_bracket(ANGLES, abs(angle)), _bracket(SPEEDS, speed), _bracket(TURN_SPEEDS, turn_speed)]
+        value = 0.0
+        for a, wa in corners[0]:
+            for s, ws in corners[1]:
+                for t, wt in corners[2]:
+                    value += wa * ws * wt * float(self.offsets[a, s, t])
+        return value
+
+# The two grid indices around value with their interpolation weights
+def _bracket(axis, value):
+    if value <= axis[0]:
+        return ((0, 1.0),)
+    if value >= axis[-1]:
+        return ((len(axis) - 1, 1.0),)
+    i = bisect.bisect_right(axis, value) - 1
+    t = (value - axis[i]) / (axis[i + 1] - axis[i])
+    return ((i, 1 - t), (i + 1, t))
+
+# Cache file for a controller setup, any change to the grid or to the code that drives the runs gives
+# a new name, so a stale table is never loaded
+def cache_path(turn_threshold=TURN_THRESHOLD, target_radius=TARGET_RADIUS):
+    digest = hashlib.sha256(repr((turn_threshold, target_radius, ANGLES, SPEEDS, TURN_SPEEDS, OFFSETS,
+                                  START_DISTANCE, HEADING_TOLERANCE)).encode())
+    for module in ("approach.py", "batch.py", "controllers.py"):
+        with open(os.path.join(PACKAGE_DIR, module), "rb") as f:
+            digest.update(f.read())
+    return os.path.join(CACHE_DIR, digest.hexdigest()[:16] + ".npz")
+
+# The cached table, or a freshly built one that is then cached (when the cache can't be written,
+# e.g. a read-only install, the table is only kept in memory)
+def _load_or_build(turn_threshold, target_radius):
+    path = cache_path(turn_threshold, target_radius)
+    try:
+        with np.load(path) as saved:
+            return ApproachTable(saved["offsets"], saved["heading_errors"], saved["ticks"])
+    except (OSError, KeyError, ValueError):
+        pass
+    table = ApproachTable.build(turn_threshold, target_radius)
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        partial = f"{path}.{os.getpid()}.tmp.npz"
+        np.savez(partial, offsets=table.offsets, heading_errors=table.heading_errors, ticks=table.ticks)
+        os.replace(partial, path)  # Other processes see the whole file or none of it
+    except OSError:
+        pass
+    return table
+
+_tables = {}  # (turn_threshold, target_radius) -> Future of its table
+_tables_lock = threading.Lock()
+
+# The table for a controller setup, loaded or built on first use and kept for the rest of the process
+# Safe to call from several threads: the first caller builds it and the others wait for that build
+# instead of starting their own
+def approach_table(turn_threshold=TURN_THRESHOLD, target_radius=TARGET_RADIUS):
+    key = (turn_threshold, target_radius)
+    with _tables_lock:
+        future = _tables.get(key)
+        building = future is None
+        if building:
+            future = _tables[key] = Future()
+    if building:
+        try:
+            future.set_result(_load_or_build(turn_threshold, target_radius))
+        except BaseException as error:
+            future.set_exception(error)
+            raise
+    return future.result()
+
+
+if __name__ == "__main__":
+    import time
+
+    from tracking.simulation import Simulation
+
+    start = time.perf_counter()
+    table = approach_table()
+    print(f"Built {table.offsets.size} entry table from {table.offsets.size * len(OFFSETS)} batched runs "
+          f"in {time.perf_counter() - start:.2f}s")
+    print(f"Entries within {math.degrees(HEADING_TOLERANCE):.0f} deg: "
+          f"{np.mean(table.heading_errors <= HEADING_TOLERANCE):.0%}")
+    start = time.perf_counter()
+    for _ in range(1000):
+        table.offset(1.0, 2.5, 0.04)
+    print(f"Lookup: {(time.perf_counter() - start) * 1000:.1f}us")
+
+    # Random targets and final headings around the field, each driven with both variants
+    rng = np.random.default_rng(0)
+    runs = 200
+    for speed, turn_speed in ((2, 0.05), (4, 0.05), (2, 0.1)):
+        results = {"performance": ([], []), "angle enforcement": ([], [])}
+        for _ in range(runs):
+            start_pos = rng.uniform((100, 100), (900, 550))
+            target = tuple(rng.uniform((100, 100), (900, 550)))
+            heading = float(rng.uniform(-math.pi, math.pi))
+            start_angle = float(rng.uniform(-math.pi, math.pi))
+            for label, final in (("performance", None), ("angle enforcement", heading)):
+                sim = Simulation(start_pos, start_angle, speed, turn_speed)
+                sim.set_target(target, final)
+                sim.run_headless(5000)
+                results[label][0].append(sim.sim_time)
+                results[label][1].append(math.degrees(abs(wrap_angle(sim.robot_angle - heading))))
+        for label, (times, errors) in results.items():
+            print(f"speed {speed}, turn {turn_speed}, {label:>17}: time-to-pose mean {np.mean(times):.2f}s "
+                  f"p95 {np.percentile(times, 95):.2f}s, final heading error mean {np.mean(errors):5.1f} deg "
+                  f"p95 {np.percentile(errors, 95):5.1f} deg")
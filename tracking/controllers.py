@@ -0,0 +1,93 @@
+#----------------
+# Motion controllers shared by main.py and trackingOnly.py
+# Kept free of pygame so they can run headless
+#----------------
+
+import math
+
+# PID Control parameters (simulated)
+TURN_THRESHOLD = math.radians(10)  # If the robot is within 10 degrees of the target, stop turning
+TARGET_RADIUS = 20  # If the robot is within this radius, ignore turning and move straight
+END_MIN_SPEED = 0.5  # Slowest pure pursuit goes while turning onto the end of a path
+
+# Function to move the robot with two PID controllers (simulated)
+# Pass a tracking.velocity.SpeedRamp as ramp to limit acceleration and brake for the target
+def move_robot_with_pid(robot_pos, target_pos, angle, speed, turn_speed,
+                        turn_threshold=TURN_THRESHOLD, target_radius=TARGET_RADIUS, ramp=None):
+    dx = target_pos[0] - robot_pos[0]
+    dy = target_pos[1] - robot_pos[1]
+    distance = math.sqrt(dx ** 2 + dy ** 2)
+    target_angle = math.atan2(dy, dx)
+    angle_diff = target_angle - angle
+
+    # Normalize the angle difference to the range [-pi, pi]
+    angle_diff = (angle_diff + math.pi) % (2 * math.pi) - math.pi
+
+    # Simulated PID control for turning
+    turn_delta = turn_speed * angle_diff / abs(angle_diff) if abs(angle_diff) > turn_threshold else 0
+
+    # Combined turn and forward movement
+    if distance > target_radius:
+        forward_speed = speed * max(0.1, 1 - abs(angle_diff) / math.pi)  # More forward speed when aligned
+        if ramp is not None:
+            forward_speed = ramp.next(forward_speed, distance - target_radius)
+        robot_pos[0] += forward_speed * math.cos(angle)
+        robot_pos[1] += forward_speed * math.sin(angle)
+        angle += turn_delta  # Apply turning
+    else:
+        if ramp is not None:
+            ramp.stop()
+        return True, angle  # Reached the target
+
+    return False, angle
+
+# Pure Pursuit algorithm to follow a path (see tracking.path.Path)
+# Pass a tracking.velocity.SpeedRamp as ramp to limit acceleration and brake for the end of the path
+def pure_pursuit(robot_pos, path, lookahead_distance, robot_angle, speed=2,
+                 turn_threshold=TURN_THRESHOLD, ramp=None):
+    if path is None or len(path) == 0:
+        return robot_pos, robot_angle, False
+
+    # Find the lookahead point on the path
+    lookahead_point = path.lookahead(robot_pos, lookahead_distance)
+    dx = lookahead_point[0] - robot_pos[0]
+    dy = lookahead_point[1] - robot_pos[1]
+
+    # Calculate angle to lookahead point
+    angle_to_point = math.atan2(dy, dx)
+    angle_diff = angle_to_point - robot_angle
+
+    # Normalize the angle difference
+    angle_diff = (angle_diff + math.pi) % (2 * math.pi) - math.pi
+
+    # Dynamically adjust turn speed based on the required angle change
+    dynamic_turn_speed = min(0.1, max(0.01, abs(angle_diff) * 0.1))
+
+    # Move towards lookahead point, at the path's planned speed when it has one
+    forward_speed = path.target_speed(speed)
+    if path.lookahead_index >= path.segment_count and abs(angle_diff) > turn_threshold:
+        # Heading for the end point off line: slow down to a turning circle (speed / turn speed) that
+        # still reaches it, a circle through the robot and the end point has radius d / (2 sin(angle))
+        reach = math.dist(robot_pos, path.end) / (2 * math.sin(min(abs(angle_diff), math.pi / 2)))
+        forward_speed = min(forward_speed, max(END_MIN_SPEED, dynamic_turn_speed * reach))
+    if ramp is not None:
+        forward_speed = ramp.next(forward_speed, path.length - path.arc_length_at(path.closest))
+    robot_angle += dynamic_turn_speed * angle_diff / abs(angle_diff) if abs(angle_diff) > turn_threshold else 0
+    robot_pos[0] += forward_speed * math.cos(robot_angle)
+    robot_pos[1] += forward_speed * math.sin(robot_angle)
+
+    return robot_pos, robot_angle, True
+
+# Model predictive control to follow a path (see tracking.path.Path)
+# controller is a tracking.mpc.MPPIController, which keeps its plan and speed between ticks and
+# handles acceleration and braking itself, so there is no ramp
+def model_predictive(robot_pos, path, robot_angle, controller):
+    if path is None or len(path) == 0:
+        return robot_pos, robot_angle, False
+
+    forward_speed, turn = controller.solve(robot_pos, robot_angle, path)
+    robot_angle += turn
+    robot_pos[0] += forward_speed * math.cos(robot_angle)
+    robot_pos[1] += forward_speed * math.sin(robot_angle)
+
+    return robot_pos, robot_angle, True
@@ -0,0 +1,253 @@
+#----------------
+# Multi-robot scenes: a Fleet of robots that each drive to their own moveToPoint target or along their
+# own pure pursuit course, and pick a new random one when they get there
+# The moveToPoint robots are stepped together by tracking.batch.BatchSimulator, the pure pursuit
+# robots each run controllers.pure_pursuit on their own Path
+# Robots that touch are pushed apart every tick. Finding them goes through a SpatialHash, a uniform
+# grid of cells at least as wide as the contact distance, so only robots in neighbouring cells are
+# compared and the cost grows with the number of robots instead of its square
+# Run `python -m tracking.fleet` to check the hash against the all-pairs check and time the ticks
+#----------------
+
+import math
+import time
+
+import numpy as np
+
+from tracking.batch import BatchSimulator
+from tracking.controllers import pure_pursuit
+from tracking.obstacles import FIELD_SIZE
+from tracking.path import Path
+
+# Cells each cell is compared with: itself and the half of its neighbours ahead of it, the other half
+# sees it from their side, so every pair of cells is visited once
+HALF_NEIGHBOURHOOD = ((0, 0), (1, 0), (-1, 1), (0, 1), (1, 1))
+LEG_CANDIDATES = 32  # Random points tried for each leg of a pure pursuit course among obstacles
+
+# Uniform grid over the field, rebuilt from the robot positions every tick
+# Built with a sort of the robots by cell, so a cell's robots are one contiguous run of `order`
+class SpatialHash:
+    def __init__(self, cell_size, size=FIELD_SIZE):
+        self.cell_size = cell_size
+        # One empty cell of padding on each side, so the neighbours of an edge cell are still cells
+        self.cols = int(math.ceil(size[0] / cell_size)) + 2
+        self.rows = int(math.ceil(size[1] / cell_size)) + 2
+        self.cells = np.zeros(0, dtype=np.int64)
+        self.order = np.zeros(0, dtype=np.int64)
+        self.start = np.zeros(self.rows * self.cols + 1, dtype=np.int64)
+
+    # Sort the robots into cells, points off the field go in the nearest edge cell
+    def build(self, x, y):
+        col = np.clip((x * (1 / self.cell_size)).astype(np.int64) + 1, 1, self.cols - 2)
+        row = np.clip((y * (1 / self.cell_size)).astype(np.int64) + 1, 1, self.rows - 2)
+        self.cells = row * self.cols + col
+        self.order = np.argsort(self.cells, kind="stable")
+        # start[c]:start[c + 1] is the run of `order` holding cell c
+        counts = np.bincount(self.cells, minlength=self.rows * self.cols)
+        self.start[1:] = np.cumsum(counts)
+
+    # Every pair (i, j), i < j, of robots closer than distance, which must be at most the cell size
+    def pairs(self, x, y, distance):
+        if distance > self.cell_size:
+            raise ValueError("distance must be at most the cell size")
+        self.build(x, y)
+        order = self.order
+        sorted_cells = self.cells[order]
+        first, second = [], []
+        for dc, dr in HALF_NEIGHBOURHOOD:
+            neighbour = sorted_cells + (dr * self.cols + dc)
+            lo = self.start[neighbour]
+            counts = self.start[neighbour + 1] - lo
+            if dc == 0 and dr == 0:
+                # Within a cell, only pair each robot with the ones after it in the run
+                rank = np.arange(len(order))
+                counts = lo + counts - rank - 1
+                lo = rank + 1
+            total = int(counts.sum())
+            if total == 0:
+                continue
+            # Expand each robot's run of candidates into one flat array of pairs
+            owner = np.repeat(np.arange(len(order)), counts)
+            offset = np.arange(total) - np.repeat(np.cumsum(counts) - counts, counts)
+            first.append(order[owner])
+            second.append(order[np.repeat(lo, counts) + offset])
+        if not first:
+            return np.zeros(0, dtype=np.int64), np.zeros(0, dtype=np.int64)
+        i = np.concatenate(first)
+        j = np.concatenate(second)
+        close = (x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2 < distance * distance
+        i, j = i[close], j[close]
+        return np.minimum(i, j), np.maximum(i, j)
+
+# The same pairs by comparing every robot with every other one, for checking the hash
+def pairs_brute_force(x, y, distance):
+    i, j = np.triu_indices(len(x), 1)
+    close = (x[i] - x[j]) ** 2 + (y[i] - y[j]) ** 2 < distance * distance
+    return i[close], j[close]
+
+
+class Fleet:
+    def __init__(self, count, size=FIELD_SIZE, pursuit_fraction=0.5, speed=2, turn_speed=0.05, pursuit_speed=3,
+                 lookahead_distance=30, final_point_tolerance=5, radius=6, course_points=3, obstacles=None, seed=0):
+        self.size = size
+        self.pursuit_speed = pursuit_speed
+        self.lookahead_distance = lookahead_distance
+        self.final_point_tolerance = final_point_tolerance
+        self.radius = radius
+        self.course_points = course_points  # Waypoints in each random pure pursuit course
+        self.obstacles = obstacles  # Optional tracking.obstacles.ObstacleMap
+        self.rng = np.random.default_rng(seed)
+        self.hash = SpatialHash(4 * radius, size)
+        self.contacts = 0  # Pairs of robots touching on the last tick
+        self.ticks = 0
+
+        x, y = self._free_points(count)
+        self.sim = BatchSimulator(x, y, self.rng.uniform(-math.pi, math.pi, count), speed=speed,
+                                  turn_speed=turn_speed)
+        # The batch simulator holds every robot's pose, pure pursuit robots are marked as arrived
+        # there so it leaves them alone
+        self.x, self.y, self.heading = self.sim.x, self.sim.y, self.sim.heading
+        self.pursuit = self.rng.random(count) < pursuit_fraction
+        self.pursuit_index = np.flatnonzero(self.pursuit).tolist()
+        self.paths = [None] * count
+        for i in self.pursuit_index:
+            self._new_course(i)
+        self._new_targets(~self.pursuit)
+
+    def __len__(self):
+        return len(self.x)
+
+    # Random points on the field, away from the edges and, with obstacles, clear of them
+    def _free_points(self, count):
+        margin = 2 * self.radius
+        x = self.rng.uniform(margin, self.size[0] - margin, count)
+        y = self.rng.uniform(margin, self.size[1] - margin, count)
+        if self.obstacles is not None:
+            for _ in range(100):
+                blocked = self.obstacles.clearance(x, y) < margin
+                if not blocked.any():
+                    break
+                x[blocked] = self.rng.uniform(margin, self.size[0] - margin, int(blocked.sum()))
+                y[blocked] = self.rng.uniform(margin, self.size[1] - margin, int(blocked.sum()))
+        return x, y
+
+    def _new_targets(self, mask):
+        target_x, target_y = np.zeros(len(self)), np.zeros(len(self))
+        target_x[mask], target_y[mask] = self._free_points(int(mask.sum()))
+        self.sim.set_targets(target_x, target_y, mask)
+
+    # Random pure pursuit course from the robot, with obstacles each leg is drawn from a batch of free
+    # points, taking the first one the robot can drive to in a straight line from the last
+    # A robot boxed in so that no leg is clear gets a course that ends where it is, and tries again
+    def _new_course(self, i):
+        if self.obstacles is None:
+            x, y = self._free_points(self.course_points)
+            self.paths[i] = Path(np.column_stack((np.r_[self.x[i], x], np.r_[self.y[i], y])))
+            return
+        points = [(float(self.x[i]), float(self.y[i]))]
+        for _ in range(self.course_points):
+            x, y = self._free_points(LEG_CANDIDATES)
+            clear = np.flatnonzero(~self.obstacles.swept_collision(points[-1][0], points[-1][1], x, y, self.radius))
+            if len(clear) == 0:
+                break
+            points.append((float(x[clear[0]]), float(y[clear[0]])))
+        self.paths[i] = Path(points)
+
+    # Advance every robot by one tick
+    def step(self):
+        before_x, before_y = self.x.copy(), self.y.copy()
+
+        # moveToPoint robots all at once, then the pure pursuit robots one at a time
+        reached = self.sim.step() & ~self.pursuit
+        x, y, heading = self.x, self.y, self.heading
+        for i in self.pursuit_index:
+            pos = [float(x[i]), float(y[i])]
+            path = self.paths[i]
+            pos, angle, _ = pure_pursuit(pos, path, self.lookahead_distance, float(heading[i]), self.pursuit_speed)
+            x[i], y[i], heading[i] = pos[0], pos[1], angle
+            if path.finished(pos, self.final_point_tolerance):
+                self._new_course(i)
+
+        # Push robots that touch apart along the line between them, half the overlap each
+        contact = 2 * self.radius
+        i, j = self.hash.pairs(x, y, contact)
+        self.contacts = len(i)
+        if len(i):
+            dx = x[j] - x[i]
+            dy = y[j] - y[i]
+            gap = np.maximum(np.hypot(dx, dy), 1e-9)
+            push = (contact - gap) / (2 * gap)
+            np.add.at(x, i, -dx * push)
+            np.add.at(y, i, -dy * push)
+            np.add.at(x, j, dx * push)
+            np.add.at(y, j, dy * push)
+        np.clip(x, 0, self.size[0], out=x)
+        np.clip(y, 0, self.size[1], out=y)
+
+        # A robot whose move runs into an obstacle stays where it was and gets a new goal
+        if self.obstacles is not None:
+            blocked = self.obstacles.swept_collision(before_x, before_y, x, y, self.radius)
+            if blocked.any():
+                x[blocked], y[blocked] = before_x[blocked], before_y[blocked]
+                reached |= blocked & ~self.pursuit
+                for k in np.flatnonzero(blocked & self.pursuit).tolist():
+                    self._new_course(k)
+
+        if reached.any():
+            self._new_targets(reached)
+        self.ticks += 1
+
+
+if __name__ == "__main__":
+    import argparse
+    import os
+
+    parser = argparse.ArgumentParser(description="Check the spatial hash and time fleet ticks and rendering")
+    parser.add_argument("--ticks", type=int, default=300)
+    args = parser.parse_args()
+
+    rng = np.random.default_rng(0)
+    for n in (100, 500, 2000):
+        x = rng.uniform(0, FIELD_SIZE[0], n)
+        y = rng.uniform(0, FIELD_SIZE[1], n)
+        grid = SpatialHash(24)
+        start = time.perf_counter()
+        for _ in range(20):
+            hashed = grid.pairs(x, y, 12)
+        hash_time = (time.perf_counter() - start) / 20
+        start = time.perf_counter()
+        for _ in range(20):
+            brute = pairs_brute_force(x, y, 12)
+        brute_time = (time.perf_counter() - start) / 20
+        same = set(zip(*map(np.ndarray.tolist, hashed))) == set(zip(*map(np.ndarray.tolist, brute)))
+        print(f"{n:>5} robots: {len(hashed[0])} close pairs, spatial hash {hash_time * 1000:.2f}ms, "
+              f"all pairs {brute_time * 1000:.2f}ms, same pairs: {same}")
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    import pygame
+
+    from tracking.widgets import WHITE, RobotSprites, draw_robot
+
+    pygame.init()
+    screen = pygame.display.set_mode(FIELD_SIZE)
+    for n in (100, 500, 1000):
+        fleet = Fleet(n)
+        sprites = RobotSprites(2 * fleet.radius)
+        step_time = draw_time = per_robot_time = 0.0
+        for _ in range(args.ticks):
+            start = time.perf_counter()
+            fleet.step()
+            step_time += time.perf_counter() - start
+            screen.fill(WHITE)
+            start = time.perf_counter()
+            sprites.draw(screen, fleet.x, fleet.y, fleet.heading)
+            draw_time += time.perf_counter() - start
+            start = time.perf_counter()
+            for x, y, angle in zip(fleet.x.tolist(), fleet.y.tolist(), fleet.heading.tolist()):
+                draw_robot(screen, (x, y), angle, 2 * fleet.radius)
+            per_robot_time += time.perf_counter() - start
+        step_ms, draw_ms = step_time / args.ticks * 1000, draw_time / args.ticks * 1000
+        print(f"{n:>5} robots: tick {step_ms:.2f}ms, sprite blits {draw_ms:.2f}ms "
+              f"(draw_robot per robot {per_robot_time / args.ticks * 1000:.2f}ms), "
+              f"{1000 / (step_ms + draw_ms):.0f} ticks+frames per second, {fleet.contacts} contacts on the last tick")
+    pygame.quit()
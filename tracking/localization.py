@@ -0,0 +1,210 @@
+#----------------
+# Localization: simulated noisy sensors on top of the true motion and a particle filter that
+# estimates the pose from them
+# Sensors turns each true tick into left/right wheel travel (encoders), a heading reading (IMU) and
+# ranges to fixed beacons, each with its own noise
+# ParticleFilter keeps every particle in NumPy arrays, so predict, weight and low-variance resample
+# are whole-array operations
+# Localizer ties the two together and is what Simulation runs every tick
+# Run `python -m tracking.localization` for estimate error and cost per tick at several particle counts
+#----------------
+
+import math
+
+import numpy as np
+
+# Beacons at the corners of the field the window shows (above the slider area)
+DEFAULT_BEACONS = ((0, 0), (1000, 0), (0, 650), (1000, 650))
+TRACK_WIDTH = 20  # Distance between the wheels, the robot is drawn 20 units wide
+
+def wrap_angle(angle):
+    return (angle + math.pi) % (2 * math.pi) - math.pi
+
+# Noisy readings of the true motion
+# Wheel noise is a fraction of the distance each wheel travelled plus a little slip every tick
+class Sensors:
+    def __init__(self, rng, track_width=TRACK_WIDTH, wheel_noise=0.02, wheel_slip=0.005, heading_noise=0.01,
+                 range_noise=2.0, beacons=DEFAULT_BEACONS):
+        self.rng = rng
+        self.track_width = track_width
+        self.wheel_noise = wheel_noise
+        self.wheel_slip = wheel_slip
+        self.heading_noise = heading_noise
+        self.range_noise = range_noise
+        self.beacons = np.asarray(beacons, dtype=np.float64).reshape(-1, 2)
+
+    # Distance each wheel reports for a move from pose `before` to pose `after` (x, y, heading)
+    def wheels(self, before, after):
+        dx, dy = after[0] - before[0], after[1] - before[1]
+        forward = math.hypot(dx, dy)
+        if dx * math.cos(before[2]) + dy * math.sin(before[2]) < 0:
+            forward = -forward
+        turn = wrap_angle(after[2] - before[2])
+        left = forward - turn * self.track_width / 2
+        right = forward + turn * self.track_width / 2
+        left += self.rng.normal(0, self.wheel_noise * abs(left) + self.wheel_slip)
+        right += self.rng.normal(0, self.wheel_noise * abs(right) + self.wheel_slip)
+        return left, right
+
+    def heading(self, pose):
+        return wrap_angle(pose[2] + self.rng.normal(0, self.heading_noise))
+
+    def ranges(self, pose):
+        distances = np.hypot(self.beacons[:, 0] - pose[0], self.beacons[:, 1] - pose[1])
+        return distances + self.rng.normal(0, self.range_noise, len(distances))
+
+
+# Pose estimate from wheel travel, heading and beacon ranges
+# The noise values are the filter's model of the sensors and are kept a bit larger than the real
+# noise so the particles don't collapse onto a wrong pose
+# Each particle's heading is kept as a unit vector (cos, sin) and turned with a second order rotation,
+# so a tick needs no trig at all, and its motion noise is sliced at a random offset from a pool of
+# normal draws made once (drawing fresh ones every tick costs more than the rest of predict)
+class ParticleFilter:
+    def __init__(self, pose, count=10000, rng=None, spread=(5.0, 0.05), track_width=TRACK_WIDTH,
+                 wheel_noise=0.05, wheel_slip=0.02, heading_noise=0.03, range_noise=5.0,
+                 beacons=DEFAULT_BEACONS, resample_threshold=0.5):
+        self.rng = rng if rng is not None else np.random.default_rng()
+        self.count = count
+        self.track_width = track_width
+        self.wheel_noise = wheel_noise
+        self.wheel_slip = wheel_slip
+        self.heading_noise = heading_noise
+        self.range_noise = range_noise
+        self.beacons = np.asarray(beacons, dtype=np.float64).reshape(-1, 2)
+        self.resample_threshold = resample_threshold  # Resample when the effective count drops below this fraction
+        self.x = pose[0] + self.rng.normal(0, spread[0], count)
+        self.y = pose[1] + self.rng.normal(0, spread[0], count)
+        heading = pose[2] + self.rng.normal(0, spread[1], count)
+        self.cos = np.cos(heading)
+        self.sin = np.sin(heading)
+        self.weights = np.full(count, 1 / count)
+        self.noise = self.rng.standard_normal(4 * count)
+        self.resamples = 0
+
+    @property
+    def heading(self):
+        return np.arctan2(self.sin, self.cos)
+
+    def _noise(self):
+        offset = self.rng.integers(0, len(self.noise) - self.count + 1)
+        return self.noise[offset:offset + self.count]
+
+    # Move every particle by the wheel travel, each with its own draw of wheel noise
+    def predict(self, left, right):
+        left = left + (self.wheel_noise * abs(left) + self.wheel_slip) * self._noise()
+        right = right + (self.wheel_noise * abs(right) + self.wheel_slip) * self._noise()
+        forward = (left + right) / 2
+        half_turn = (right - left) / (2 * self.track_width)
+        # Rotate by half the turn, move along that heading, then rotate by the other half
+        k = 1 - half_turn * half_turn / 2
+        cos = self.cos * k - self.sin * half_turn
+        sin = self.sin * k + self.cos * half_turn
+        self.x += forward * cos
+        self.y += forward * sin
+        self.cos = cos * k - sin * half_turn
+        self.sin = sin * k + cos * half_turn
+
+    # Reweight the particles by how well they explain the readings
+    # Heading error uses cos(error) - 1, which is -error^2 / 2 for small errors and needs no angle wrapping
+    def update(self, heading, ranges=None):
+        likelihood = (math.cos(heading) * self.cos + math.sin(heading) * self.sin - 1) / self.heading_noise ** 2
+        if ranges is not None:
+            scale = 0.5 / self.range_noise ** 2
+            for (bx, by), measured in zip(self.beacons, ranges):
+                dx = self.x - bx
+                dy = self.y - by
+                miss = np.sqrt(dx * dx + dy * dy) - measured
+                likelihood -= scale * miss * miss
+        # Shift by the best particle before exponentiating so at least one weight stays finite
+        weights = self.weights * np.exp(likelihood - likelihood.max())
+        total = weights.sum()
+        if total > 0:
+            self.weights = weights / total
+        else:
+            self.weights = np.full(self.count, 1 / self.count)
+
+    def effective_count(self):
+        return 1 / np.dot(self.weights, self.weights)
+
+    # Low-variance resampling: one random offset and evenly spaced pointers into the cumulative
+    # weights, so a particle with weight w is copied about w * count times
+    # With evenly spaced pointers the number of copies of each particle is just the number of
+    # pointers below its cumulative weight minus those below the previous one, no search needed
+    def resample(self, force=False):
+        if not force and self.effective_count() >= self.resample_threshold * self.count:
+            return False
+        cumulative = np.cumsum(self.weights)
+        below = np.ceil(cumulative * (self.count / cumulative[-1]) - self.rng.random()).astype(np.int64)
+        below[-1] = self.count
+        index = np.repeat(np.arange(self.count), np.diff(below, prepend=0))
+        self.x = self.x[index]
+        self.y = self.y[index]
+        # Renormalize the heading vectors, the second order rotations let them grow very slowly
+        norm = np.sqrt(self.cos * self.cos + self.sin * self.sin)
+        self.cos = (self.cos / norm)[index]
+        self.sin = (self.sin / norm)[index]
+        self.weights = np.full(self.count, 1 / self.count)
+        self.resamples += 1
+        return True
+
+    # Weighted mean pose, the heading averaged on the circle
+    def estimate(self):
+        x = float(np.dot(self.weights, self.x))
+        y = float(np.dot(self.weights, self.y))
+        heading = math.atan2(float(np.dot(self.weights, self.sin)), float(np.dot(self.weights, self.cos)))
+        return x, y, heading
+
+
+# Runs the sensors and the filter for a Simulation
+# All arguments are plain values so the settings can go in Simulation.config and a log replays the
+# same noise from the same seed
+class Localizer:
+    def __init__(self, pose, particles=10000, seed=0, beacons=DEFAULT_BEACONS, wheel_noise=0.02, wheel_slip=0.005,
+                 heading_noise=0.01, range_noise=2.0):
+        self.rng = np.random.default_rng(seed)
+        self.sensors = Sensors(self.rng, wheel_noise=wheel_noise, wheel_slip=wheel_slip, heading_noise=heading_noise,
+                               range_noise=range_noise, beacons=beacons)
+        self.filter = ParticleFilter(pose, particles, self.rng, beacons=beacons)
+        self.estimate = self.filter.estimate()
+
+    # Feed one tick of true motion through the sensors and into the filter
+    def update(self, before, after):
+        left, right = self.sensors.wheels(before, after)
+        self.filter.predict(left, right)
+        self.filter.update(self.sensors.heading(after), self.sensors.ranges(after) if len(self.filter.beacons) else None)
+        self.filter.resample()
+        self.estimate = self.filter.estimate()
+        return self.estimate
+
+    # Distance between the estimate and a true position
+    def error(self, pos):
+        return math.dist(self.estimate[:2], pos)
+
+
+if __name__ == "__main__":
+    import time
+
+    from tracking.simulation import Simulation
+
+    # Drive the same pure pursuit course with several particle counts, with and without beacons,
+    # and once steering off the estimate instead of the true pose
+    course = [(300, 500), (500, 150), (700, 500), (900, 150), (900, 600), (150, 600)]
+    runs = [(1000, DEFAULT_BEACONS, False), (10000, DEFAULT_BEACONS, False), (50000, DEFAULT_BEACONS, False),
+            (10000, (), False), (10000, DEFAULT_BEACONS, True)]
+    for particles, beacons, drive_on_estimate in runs:
+        sim = Simulation([100, 325], pursuit_speed=4, localization=dict(particles=particles, beacons=beacons),
+                         drive_on_estimate=drive_on_estimate)
+        for point in course:
+            sim.add_waypoint(point)
+        sim.start_pure_pursuit()
+        errors = []
+        start = time.perf_counter()
+        while sim.step() and sim.ticks < 20000:
+            errors.append(sim.localizer.error(sim.robot_pos))
+        per_tick = (time.perf_counter() - start) / sim.ticks
+        label = f"{particles} particles, {'beacons' if beacons else 'no beacons'}"
+        if drive_on_estimate:
+            label += ", driving off the estimate"
+        print(f"{label:>50}: mean error {np.mean(errors):.2f}, max {np.max(errors):.2f}, "
+              f"final {errors[-1]:.2f}, {per_tick * 1e6:.0f}us per tick, {sim.localizer.filter.resamples} resamples")
@@ -0,0 +1,136 @@
+#----------------
+# Sampling based model predictive control (MPPI) for following a path
+# The plan is an acceleration and a turn for each of the next `horizon` ticks. Every tick, `samples`
+# noisy copies of it are rolled out over the unicycle model (turn, then move along the new heading,
+# like the other controllers) as one NumPy batch: the cumulative sums over the horizon give every
+# rollout's speeds, headings and positions without a Python loop
+# Each rollout is scored by how far it strays from where the path's speed profile says the robot
+# should be at each tick, plus how jerky its steering is and how close it gets to obstacles, and the
+# plan becomes the exponentially weighted average of the samples
+# The plan is shifted by one tick and reused (warm start), so a few hundred samples refine it
+# instead of searching from scratch
+# Run `python -m tracking.mpc` to compare it against pure pursuit and time the solves
+#----------------
+
+import math
+import time
+
+import numpy as np
+
+from tracking.profiler import RollingHistogram
+
+class MPPIController:
+    def __init__(self, max_speed=5, max_accel=0.1, max_turn=0.1, horizon=30, samples=256, accel_noise=0.05,
+                 turn_noise=0.04, temperature=0.1, track_weight=1.0, terminal_weight=10.0, turn_weight=50.0,
+                 obstacles=None, radius=10, obstacle_weight=1000.0, seed=0):
+        self.max_speed = max_speed
+        self.max_accel = max_accel  # Speed change per tick
+        self.max_turn = max_turn  # Heading change per tick
+        self.horizon = horizon
+        self.samples = samples
+        self.noise_scale = np.array([accel_noise, turn_noise])
+        self.temperature = temperature  # Fraction of the mean cost gap used as the softmax temperature
+        self.track_weight = track_weight
+        self.terminal_weight = terminal_weight  # Extra weight on the last tick of the horizon
+        self.turn_weight = turn_weight  # Cost of changing the turn rate between ticks
+        self.obstacles = obstacles  # Optional tracking.obstacles.ObstacleMap
+        self.radius = radius
+        self.obstacle_weight = obstacle_weight
+        self.rng = np.random.default_rng(seed)
+        self.steps = np.arange(1, horizon + 1)
+        self.solve_times = RollingHistogram()  # Milliseconds per solve
+        self.last_solve_time = 0.0
+        self.reset()
+
+    # Forget the plan, for a new path
+    def reset(self, speed=0.0):
+        self.plan = np.zeros((self.horizon, 2))
+        self.speed = speed
+
+    # Arc length the path's speed profile reaches at each tick of the horizon, starting from s
+    # Without a profile the robot is asked for top speed, capped so it can still brake for the end
+    def _reference(self, path, s):
+        end = path.length
+        reach = []
+        brake = 2 * self.max_accel
+        for _ in range(self.horizon):
+            v = min(path.speed_at(s, self.max_speed), self.max_speed, math.sqrt(brake * max(end - s, 0.0)))
+            s = min(s + v, end)
+            reach.append(s)
+        reach = np.array(reach)
+        return np.interp(reach, path.s, path.points[:, 0]), np.interp(reach, path.s, path.points[:, 1])
+
+    # One solve: refine the plan against the path from the current pose and return this tick's
+    # (forward speed, turn), the speed is kept as the model's state for the next tick
+    def solve(self, pos, angle, path):
+        start = time.perf_counter()
+        reach = 2 * self.max_speed * self.horizon
+        closest = path.update_closest(pos, reach)
+        ref_x, ref_y = self._reference(path, path.arc_length_at(closest))
+
+        # Sample around the plan, clip to the limits and keep the noise that survived the clipping
+        controls = self.plan + self.rng.standard_normal((self.samples, self.horizon, 2)) * self.noise_scale
+        controls[0] = self.plan  # The unperturbed plan is always a candidate
+        accel = np.clip(controls[:, :, 0], -self.max_accel, self.max_accel)
+        turn = np.clip(controls[:, :, 1], -self.max_turn, self.max_turn)
+
+        speeds = np.clip(self.speed + np.cumsum(accel, axis=1), 0.0, self.max_speed)
+        headings = angle + np.cumsum(turn, axis=1)
+        xs = pos[0] + np.cumsum(speeds * np.cos(headings), axis=1)
+        ys = pos[1] + np.cumsum(speeds * np.sin(headings), axis=1)
+
+        error = (xs - ref_x) ** 2 + (ys - ref_y) ** 2
+        cost = self.track_weight * error.sum(axis=1) + self.terminal_weight * error[:, -1]
+        cost += self.turn_weight * (np.diff(turn, axis=1) ** 2).sum(axis=1)
+        if self.obstacles is not None:
+            cost += self.obstacle_weight * (self.obstacles.clearance(xs, ys) < self.radius).sum(axis=1)
+
+        # Softmax over the costs, the temperature scales with how spread out they are
+        best = cost.min()
+        spread = max(float(cost.mean() - best), 1e-9)
+        weights = np.exp(-(cost - best) / (self.temperature * spread))
+        weights /= weights.sum()
+        self.plan[:, 0] = weights @ accel
+        self.plan[:, 1] = weights @ turn
+
+        # Apply the first tick, then shift the plan for the warm start
+        accel_now, turn_now = float(self.plan[0, 0]), float(self.plan[0, 1])
+        self.speed = min(max(self.speed + accel_now, 0.0), self.max_speed)
+        self.plan[:-1] = self.plan[1:]
+        self.last_solve_time = (time.perf_counter() - start) * 1000
+        self.solve_times.add(self.last_solve_time)
+        return self.speed, turn_now
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tracking.simulation import Simulation
+    from tracking.sweep import DEFAULT_SCENARIOS
+
+    parser = argparse.ArgumentParser(description="Compare the MPPI controller with pure pursuit")
+    parser.add_argument("--samples", type=int, default=256)
+    parser.add_argument("--horizon", type=int, default=30)
+    args = parser.parse_args()
+
+    for scenario in DEFAULT_SCENARIOS:
+        if "waypoints" not in scenario:
+            continue
+        for label, mpc in (("pure pursuit", None), ("MPPI", dict(samples=args.samples, horizon=args.horizon))):
+            sim = Simulation(scenario["start"], math.radians(scenario["heading"]), pursuit_speed=5, max_accel=0.1,
+                             mpc=mpc)
+            for point in scenario["waypoints"]:
+                sim.add_waypoint(tuple(point))
+            sim.start_pure_pursuit()
+            path = sim.pure_pursuit_path
+            points = path.points
+            worst = 0.0
+            while sim.step() and sim.ticks < 5000:
+                worst = max(worst, float(np.min(np.hypot(points[:, 0] - sim.robot_pos[0],
+                                                         points[:, 1] - sim.robot_pos[1]))))
+            line = f"{scenario['name']:>16} {label:>12}: {sim.sim_time:5.2f}s, max tracking error {worst:5.1f}"
+            if sim.mpc is not None:
+                times = sim.mpc.solve_times
+                line += (f", solve p50 {times.percentile(50):.2f}ms p95 {times.percentile(95):.2f}ms "
+                         f"p99 {times.percentile(99):.2f}ms ({args.samples} samples x {args.horizon} ticks)")
+            print(line)
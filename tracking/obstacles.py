@@ -0,0 +1,210 @@
+#----------------
+# Static obstacles: loaded from a JSON file, rasterized once into an occupancy grid plus a distance
+# transform (distance from every cell to the nearest occupied cell), then queried with whole-array
+# lookups, so checking thousands of robots or rays never loops over obstacles in Python
+# File format, a list of shapes in field units:
+#   [{"rect": [x, y, w, h]}, {"circle": [x, y, r]}, {"polygon": [[x, y], [x, y], ...]}]
+# The field edges count as walls unless border=False
+# Run `python -m tracking.obstacles fields/example.json` for build and query timings
+#----------------
+
+import json
+import math
+
+import numpy as np
+
+FIELD_SIZE = (1000, 650)  # The part of the window above the slider area
+
+def load_obstacles(path):
+    with open(path) as f:
+        shapes = json.load(f)
+    for shape in shapes:
+        if len(shape) != 1 or next(iter(shape)) not in ("rect", "circle", "polygon"):
+            raise ValueError(f"{path}: expected {{'rect'|'circle'|'polygon': ...}}, got {shape!r}")
+    return shapes
+
+# Exact Euclidean distance (in cells) from every cell to the nearest occupied cell
+# Separable: first the distance to the nearest occupied cell in the same column with one scan down
+# and one up, then for each row the minimum over columns k of column_distance[k]^2 + (j - k)^2
+def distance_transform(occupied, chunk_cells=4000000):
+    rows, cols = occupied.shape
+    far = float(rows + cols)
+    column = np.where(occupied, 0.0, far)
+    for i in range(1, rows):
+        np.minimum(column[i], column[i - 1] + 1, out=column[i])
+    for i in range(rows - 2, -1, -1):
+        np.minimum(column[i], column[i + 1] + 1, out=column[i])
+    squared = column ** 2
+    offsets = (np.arange(cols)[:, None] - np.arange(cols)[None, :]) ** 2.0
+    result = np.empty_like(squared)
+    chunk = max(1, chunk_cells // (cols * cols))
+    for start in range(0, rows, chunk):
+        result[start:start + chunk] = (squared[start:start + chunk, None, :] + offsets[None]).min(axis=2)
+    return np.sqrt(result)
+
+
+class ObstacleMap:
+    def __init__(self, shapes=(), size=FIELD_SIZE, resolution=4.0, border=True):
+        self.shapes = list(shapes)
+        self.width, self.height = size
+        self.resolution = resolution
+        self.cols = int(math.ceil(self.width / resolution))
+        self.rows = int(math.ceil(self.height / resolution))
+        self.occupied = np.zeros((self.rows, self.cols), dtype=bool)
+        for shape in self.shapes:
+            self._rasterize(shape)
+        if border:
+            self.occupied[[0, -1], :] = True
+            self.occupied[:, [0, -1]] = True
+        # Distance in field units from each cell centre to the nearest occupied cell centre
+        self.distance = distance_transform(self.occupied) * resolution
+        # A point can be half a cell diagonal from its cell centre, and an occupied cell reaches half a
+        # diagonal past its own centre, so clearance is the cell distance less one diagonal
+        self.margin = resolution * math.sqrt(2)
+        self.distance_flat = self.distance.ravel()
+        self.distance_list = self.distance.tolist()  # Row lists for the scalar collides()
+        self.inflated_cache = {}
+
+    # Mark the cells a shape covers: rectangles by overlap (so thin walls never vanish), circles and
+    # polygons by cell centre
+    def _rasterize(self, shape):
+        h = self.resolution
+        kind, value = next(iter(shape.items()))
+        if kind == "rect":
+            x, y, w, height = value
+            j0, j1 = int(math.floor(x / h)), int(math.ceil((x + w) / h))
+            i0, i1 = int(math.floor(y / h)), int(math.ceil((y + height) / h))
+            self.occupied[max(i0, 0):max(i1, 0), max(j0, 0):max(j1, 0)] = True
+            return
+        if kind == "circle":
+            cx, cy, r = value
+            left, top, right, bottom = cx - r, cy - r, cx + r, cy + r
+        else:
+            points = np.asarray(value, dtype=np.float64)
+            (left, top), (right, bottom) = points.min(axis=0), points.max(axis=0)
+        j0, j1 = max(int(left / h), 0), min(int(right / h) + 1, self.cols)
+        i0, i1 = max(int(top / h), 0), min(int(bottom / h) + 1, self.rows)
+        if j0 >= j1 or i0 >= i1:
+            return
+        px = (np.arange(j0, j1) + 0.5) * h
+        py = (np.arange(i0, i1) + 0.5) * h
+        px, py = np.meshgrid(px, py)
+        if kind == "circle":
+            inside = (px - cx) ** 2 + (py - cy) ** 2 <= r * r
+        else:
+            # Even-odd rule, one vectorized pass per polygon edge
+            inside = np.zeros(px.shape, dtype=bool)
+            for (ax, ay), (bx, by) in zip(points, np.roll(points, -1, axis=0)):
+                crosses = (ay > py) != (by > py)
+                with np.errstate(divide="ignore", invalid="ignore"):
+                    x_cross = ax + (py - ay) * (bx - ax) / (by - ay)
+                inside ^= crosses & (px < x_cross)
+        self.occupied[i0:i1, j0:j1] |= inside
+
+    # Flat index into the grid of the cell holding each point, points off the field clamp to the edge
+    def _cells(self, x, y):
+        i = np.clip((np.asarray(y) * (1 / self.resolution)).astype(np.int64), 0, self.rows - 1)
+        j = np.clip((np.asarray(x) * (1 / self.resolution)).astype(np.int64), 0, self.cols - 1)
+        return i * self.cols + j
+
+    # Lower bound on the distance from each point to the nearest obstacle, negative means inside one
+    # Points off the field read the nearest edge cell, which is a wall when the border is on
+    def clearance(self, x, y):
+        return self.distance_flat[self._cells(x, y)] - self.margin
+
+    # True for each robot whose circular footprint of `radius` hits an obstacle anywhere on the
+    # straight move from (x0, y0) to (x1, y1)
+    # The move is sampled every half cell, all robots and samples in one lookup
+    def swept_collision(self, x0, y0, x1, y1, radius):
+        x0, y0, x1, y1 = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (x0, y0, x1, y1)))
+        longest = float(np.max(np.hypot(x1 - x0, y1 - y0))) if x0.size else 0.0
+        samples = max(int(math.ceil(longest / (self.resolution / 2))), 1) + 1
+        t = np.linspace(0.0, 1.0, samples)
+        xs = x0[..., None] + (x1 - x0)[..., None] * t
+        ys = y0[..., None] + (y1 - y0)[..., None] * t
+        return (self.clearance(xs, ys) < radius).any(axis=-1)
+
+    # swept_collision for a single robot in plain Python, for the per-tick check in Simulation where
+    # setting up arrays would cost more than the lookups
+    def collides(self, x0, y0, x1, y1, radius):
+        samples = max(int(math.ceil(math.hypot(x1 - x0, y1 - y0) / (self.resolution / 2))), 1)
+        scale = 1 / self.resolution
+        limit = radius + self.margin
+        for k in range(samples + 1):
+            t = k / samples
+            i = min(max(int((y0 + (y1 - y0) * t) * scale), 0), self.rows - 1)
+            j = min(max(int((x0 + (x1 - x0) * t) * scale), 0), self.cols - 1)
+            if self.distance_list[i][j] < limit:
+                return True
+        return False
+
+    # Distance along each ray to the first occupied cell, capped at max_range
+    # Sphere tracing: each ray jumps ahead by its clearance (at least half a cell), so open space is
+    # crossed in a few steps and only rays skimming a wall take small ones
+    # Rays that have finished are dropped from the arrays, so late iterations only touch the few left
+    def raycast(self, x, y, angle, max_range=1000.0):
+        x, y, angle = np.broadcast_arrays(*(np.atleast_1d(np.asarray(v, dtype=np.float64)) for v in (x, y, angle)))
+        shape = x.shape
+        px, py = x.ravel().copy(), y.ravel().copy()
+        dx, dy = np.cos(angle).ravel(), np.sin(angle).ravel()
+        t = np.zeros(px.size)
+        rays = np.arange(px.size)
+        result = np.full(px.size, float(max_range))
+        min_step = self.resolution / 2
+        for _ in range(int(2 * max_range / min_step) + 1):
+            distance = self.distance_flat[self._cells(px, py)]
+            done = (distance == 0) | (t >= max_range)
+            if done.any():
+                result[rays[done]] = t[done]
+                keep = ~done
+                rays, px, py, dx, dy, t, distance = rays[keep], px[keep], py[keep], dx[keep], dy[keep], t[keep], distance[keep]
+                if rays.size == 0:
+                    break
+            step = np.maximum(distance - self.margin, min_step)
+            t += step
+            px += step * dx
+            py += step * dy
+        return np.minimum(result, max_range).reshape(shape)
+
+    # Occupancy grown by a robot radius, for planners that treat the robot as a point
+    def inflated(self, radius):
+        grid = self.inflated_cache.get(radius)
+        if grid is None:
+            grid = self.inflated_cache[radius] = self.distance - self.margin < radius
+        return grid
+
+
+if __name__ == "__main__":
+    import argparse
+    import time
+
+    parser = argparse.ArgumentParser(description="Build an obstacle map and time its queries")
+    parser.add_argument("obstacles", nargs="?", help="obstacle JSON file (default: border walls only)")
+    parser.add_argument("--resolution", type=float, default=4.0)
+    args = parser.parse_args()
+
+    shapes = load_obstacles(args.obstacles) if args.obstacles else []
+    start = time.perf_counter()
+    field = ObstacleMap(shapes, resolution=args.resolution)
+    print(f"{len(shapes)} shapes -> {field.cols}x{field.rows} grid, {field.occupied.mean():.1%} occupied, "
+          f"built in {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    rng = np.random.default_rng(0)
+    for robots in (1, 500, 10000):
+        x, y = rng.uniform(0, field.width, robots), rng.uniform(0, field.height, robots)
+        heading = rng.uniform(-math.pi, math.pi, robots)
+        start = time.perf_counter()
+        for _ in range(20):
+            hits = field.swept_collision(x, y, x + 5 * np.cos(heading), y + 5 * np.sin(heading), 10)
+        per_call = (time.perf_counter() - start) / 20
+        print(f"swept collision, {robots:>5} robots: {per_call * 1e6:8.0f}us per tick, {hits.mean():.1%} colliding")
+    start = time.perf_counter()
+    for _ in range(1000):
+        field.collides(500, 100, 503, 104, 10)
+    print(f"scalar collides, 1 robot: {(time.perf_counter() - start) * 1e3:8.1f}us per tick")
+    for rays in (1, 360, 10000):
+        x, y = np.full(rays, 150.0), np.full(rays, 325.0)
+        start = time.perf_counter()
+        distances = field.raycast(x, y, np.linspace(-math.pi, math.pi, rays, endpoint=False))
+        print(f"raycast, {rays:>5} rays: {(time.perf_counter() - start) * 1e6:8.0f}us, "
+              f"mean range {distances.mean():.1f}")
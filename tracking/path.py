@@ -0,0 +1,217 @@
+#----------------
+# Polyline path for pure pursuit
+# Points are stored with the cumulative arc length, and the closest point and lookahead point
+# are only searched in a short window ahead of where they were last tick, so following a path
+# with thousands of points costs the same per tick as following one with three
+# An optional target speed per point (see tracking.smoothing) is read at the closest point
+# Run `python -m tracking.path` to check that pure pursuit finishes random courses
+#----------------
+
+import bisect
+import math
+
+import numpy as np
+
+class Path:
+    def __init__(self, points, speeds=None, search_window=2.0):
+        points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+        if len(points) == 0:
+            raise ValueError("a path needs at least one point")
+        # Drop repeated points so every segment has a length
+        keep = np.ones(len(points), dtype=bool)
+        keep[1:] = np.any(np.diff(points, axis=0) != 0, axis=1)
+        self.points = points[keep]
+        self.speeds = None if speeds is None else np.asarray(speeds, dtype=np.float64)[keep]
+        self.lengths = np.hypot(*np.diff(self.points, axis=0).T)
+        self.s = np.concatenate(([0.0], np.cumsum(self.lengths)))  # Arc length at each point
+        self.search_window = search_window  # How far ahead to search, in lookahead distances
+
+        # Plain lists for the per-tick scalar math, indexing NumPy arrays one value at a time is slow
+        self._x = self.points[:, 0].tolist()
+        self._y = self.points[:, 1].tolist()
+        self._s = self.s.tolist()
+        self._v = None if self.speeds is None else self.speeds.tolist()
+        self.reset()
+
+    # Start following from the beginning again
+    def reset(self):
+        self.closest = 0.0  # Fractional index of the closest point (segment index + t)
+        self.lookahead_index = 0.0  # Fractional index of the last lookahead point
+        self.lookahead_point = self.point_at(min(1, self.segment_count))
+        self.end_distance = math.inf  # Distance to the end when finished() was last asked, once past it
+
+    def __len__(self):
+        return len(self._x)
+
+    @property
+    def segment_count(self):
+        return len(self._x) - 1
+
+    @property
+    def length(self):
+        return self._s[-1]
+
+    @property
+    def end(self):
+        return (self._x[-1], self._y[-1])
+
+    # Point at a fractional index
+    def point_at(self, index):
+        i = min(int(index), self.segment_count - 1)
+        if i < 0:
+            return (self._x[0], self._y[0])
+        t = index - i
+        return (self._x[i] + t * (self._x[i + 1] - self._x[i]), self._y[i] + t * (self._y[i + 1] - self._y[i]))
+
+    # Target speed at the closest point, or default when the path has no speed profile
+    def target_speed(self, default):
+        if self._v is None:
+            return default
+        return self._v[min(int(self.closest + 0.5), len(self._v) - 1)]
+
+    # Target speed at the first point at least `distance` along the path, or default without a profile
+    def speed_at(self, distance, default):
+        if self._v is None:
+            return default
+        return self._v[min(bisect.bisect_left(self._s, distance), len(self._v) - 1)]
+
+    # Arc length at a fractional index
+    def arc_length_at(self, index):
+        i = min(int(index), self.segment_count - 1)
+        if i < 0:
+            return 0.0
+        return self._s[i] + (index - i) * (self._s[i + 1] - self._s[i])
+
+    # Index one past the last segment that starts within `reach` arc length of the closest point
+    def _window_end(self, reach):
+        last = bisect.bisect_right(self._s, self.arc_length_at(self.closest) + reach)
+        return min(max(last, int(self.closest) + 1), self.segment_count)
+
+    # Move the closest point forward along the path, never backwards
+    def update_closest(self, pos, reach):
+        first = min(int(self.closest), self.segment_count - 1)
+        last = self._window_end(reach)
+        if last - first > 32:
+            # Dense paths put hundreds of segments in the window, check them as one array
+            starts = self.points[first:last]
+            sx = self.points[first + 1:last + 1, 0] - starts[:, 0]
+            sy = self.points[first + 1:last + 1, 1] - starts[:, 1]
+            px = pos[0] - starts[:, 0]
+            py = pos[1] - starts[:, 1]
+            t = np.clip((px * sx + py * sy) / self.lengths[first:last] ** 2, 0, 1)
+            best = int(np.argmin(np.hypot(px - t * sx, py - t * sy)))
+            self.closest = max(self.closest, first + best + float(t[best]))
+            return self.closest
+
+        best_dist = math.inf
+        best = self.closest
+        for i in range(first, last):
+            x0, y0 = self._x[i], self._y[i]
+            sx, sy = self._x[i + 1] - x0, self._y[i + 1] - y0
+            px, py = pos[0] - x0, pos[1] - y0
+            t = min(1.0, max(0.0, (px * sx + py * sy) / (sx * sx + sy * sy)))
+            dist = math.hypot(px - t * sx, py - t * sy)
+            if dist < best_dist:
+                best_dist = dist
+                best = i + t
+        self.closest = max(self.closest, best)
+        return self.closest
+
+    # Find the lookahead point: the first place past the closest point where the path leaves
+    # a circle of radius `distance` around the robot
+    def lookahead(self, pos, distance):
+        if self.segment_count == 0:
+            self.lookahead_point = self.end
+            return self.lookahead_point
+
+        reach = distance * self.search_window
+        self.update_closest(pos, reach)
+        minimum = max(self.closest, self.lookahead_index)
+        for i in range(int(minimum), self._window_end(reach)):
+            # Segment-circle intersection: |start + t * segment - pos| = distance
+            x0, y0 = self._x[i], self._y[i]
+            sx, sy = self._x[i + 1] - x0, self._y[i + 1] - y0
+            fx, fy = x0 - pos[0], y0 - pos[1]
+            a = sx * sx + sy * sy
+            b = 2 * (fx * sx + fy * sy)
+            c = fx * fx + fy * fy - distance * distance
+            disc = b * b - 4 * a * c
+            if disc < 0:
+                continue
+            root = math.sqrt(disc)
+            for t in ((-b - root) / (2 * a), (-b + root) / (2 * a)):
+                if 0 <= t <= 1 and i + t >= minimum:
+                    self.lookahead_index = i + t
+                    self.lookahead_point = (x0 + t * sx, y0 + t * sy)
+                    return self.lookahead_point
+
+        if self.remaining() < distance and math.dist(pos, self.end) < distance:
+            # Within a lookahead of the end along the path and inside the circle of the last point,
+            # head straight for it. Passing near the end earlier on (a course that crosses itself)
+            # doesn't count, or the robot would skip the rest of the course
+            self.lookahead_index = float(self.segment_count)
+            self.lookahead_point = self.end
+        elif self.lookahead_index < self.closest:
+            # Off the path with the last lookahead point already behind the closest point, steering
+            # back at that would circle it, so head for the closest point instead
+            self.lookahead_index = self.closest
+            self.lookahead_point = self.point_at(self.closest)
+        # Otherwise the robot is off the path, keep steering at the previous lookahead point
+        return self.lookahead_point
+
+    # Arc length left from the closest point to the end
+    def remaining(self):
+        return self.length - self.arc_length_at(self.closest)
+
+    # True once the robot has followed the path up to the end and is within tolerance of it
+    # The closest point is then within 2 * tolerance of the end, so on a final stretch that isn't
+    # sharply curved it is within about that much arc length
+    # A robot that went past the end (its closest point is the end itself) without getting within
+    # tolerance, but within 2 * tolerance, turns too wide to come back any closer, so it finishes once
+    # it starts moving away. Further out it keeps going, pure pursuit slows down to turn onto the end
+    def finished(self, pos, tolerance):
+        if self.remaining() >= 2 * tolerance:
+            return False
+        distance = math.dist(pos, self.end)
+        if distance < tolerance:
+            return True
+        if self.closest < self.segment_count or distance > 2 * tolerance:
+            return False
+        moving_away = distance > self.end_distance
+        self.end_distance = distance
+        return moving_away
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tracking.simulation import Simulation
+
+    parser = argparse.ArgumentParser(description="Check that pure pursuit finishes random courses")
+    parser.add_argument("--courses", type=int, default=100)
+    parser.add_argument("--max-ticks", type=int, default=20000)
+    args = parser.parse_args()
+
+    # Random 4 waypoint courses that often cross themselves and pass near their own end early on
+    rng = np.random.default_rng(0)
+    unfinished = 0
+    for speed in (2, 6):
+        for smooth in (True, False):
+            stuck = 0
+            errors = []
+            for _ in range(args.courses):
+                start = rng.uniform((50, 50), (950, 600))
+                waypoints = [tuple(p) for p in rng.uniform((50, 50), (950, 600), (4, 2)).tolist()]
+                sim = Simulation(start.tolist(), float(rng.uniform(-math.pi, math.pi)), pursuit_speed=speed,
+                                 smooth_paths=smooth)
+                for point in waypoints:
+                    sim.add_waypoint(point)
+                sim.start_pure_pursuit()
+                sim.run_headless(args.max_ticks)
+                stuck += sim.busy
+                errors.append(math.dist(sim.robot_pos, waypoints[-1]))
+            unfinished += stuck
+            print(f"speed {speed}, {'smoothed' if smooth else 'raw'}: {stuck}/{args.courses} never finished, "
+                  f"distance from the end p50 {np.median(errors):.1f} p95 {np.percentile(errors, 95):.1f} "
+                  f"max {max(errors):.1f}")
+    raise SystemExit(1 if unfinished else 0)
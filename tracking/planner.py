@@ -0,0 +1,343 @@
+#----------------
+# Grid path planning on an ObstacleMap, producing waypoints for pure pursuit
+# The map's occupancy is grown by the robot radius plus some clearance (so the robot can be planned
+# for as a point, and smoothing the route for pure pursuit doesn't pull it into a wall)
+# AStarSearch is A* over the 8-connected grid with a heapq open list and the octile distance
+# heuristic, jump_points=True runs jump point search instead, which skips over runs of open cells
+# Its compute() takes a time budget and picks up where it stopped, so the window spreads a long
+# search over several frames instead of stalling one; astar() runs it in one go
+# shortcut() drops every route point the robot can skip with a straight, collision-free line
+# Run `python -m tracking.planner fields/example.json` to compare them
+#----------------
+
+import heapq
+import math
+import time
+
+import numpy as np
+
+# Step costs in integers, so routes of the same length cost exactly the same and ties on f are broken
+# by depth instead of rounding error
+# 14 / 10 is within 1% of sqrt(2), costs are turned back into field units with COST_SCALE
+STRAIGHT, DIAGONAL = 10, 14
+COST_SCALE = 1 / STRAIGHT
+INF = math.inf
+
+# Grid of free/blocked cells in flat (row * cols + col) form, with the conversions to field units
+class PlanningGrid:
+    def __init__(self, field, radius=10, clearance=15):
+        self.resolution = field.resolution
+        self.rows, self.cols = field.rows, field.cols
+        self.blocked = bytearray(field.inflated(radius + clearance).ravel().tobytes())
+        # Neighbour offsets (drow, dcol, flat offset, cost), orthogonal first
+        cols = self.cols
+        self.moves = [(dr, dc, dr * cols + dc, DIAGONAL if dr and dc else STRAIGHT)
+                      for dr, dc in ((0, 1), (1, 0), (0, -1), (-1, 0), (1, 1), (1, -1), (-1, 1), (-1, -1))]
+
+    def cell(self, point):
+        row = min(max(int(point[1] / self.resolution), 0), self.rows - 1)
+        col = min(max(int(point[0] / self.resolution), 0), self.cols - 1)
+        return row * self.cols + col
+
+    def point(self, cell):
+        row, col = divmod(cell, self.cols)
+        return ((col + 0.5) * self.resolution, (row + 0.5) * self.resolution)
+
+    def free(self, row, col):
+        return 0 <= row < self.rows and 0 <= col < self.cols and not self.blocked[row * self.cols + col]
+
+    # Closest free cell to a cell, for starts and goals that land in the grown obstacles
+    def nearest_free(self, cell):
+        if not self.blocked[cell]:
+            return cell
+        grid = np.frombuffer(bytes(self.blocked), dtype=np.uint8).reshape(self.rows, self.cols)
+        free_rows, free_cols = np.nonzero(grid == 0)
+        if len(free_rows) == 0:
+            return None
+        row, col = divmod(cell, self.cols)
+        best = int(np.argmin((free_rows - row) ** 2 + (free_cols - col) ** 2))
+        return int(free_rows[best]) * self.cols + int(free_cols[best])
+
+    # Walkable neighbours of a cell with their step cost, diagonals only when both sides are open so
+    # the route never cuts a corner
+    def neighbours(self, cell):
+        row, col = divmod(cell, self.cols)
+        rows, cols, blocked = self.rows, self.cols, self.blocked
+        result = []
+        for dr, dc, offset, cost in self.moves:
+            r, c = row + dr, col + dc
+            if 0 <= r < rows and 0 <= c < cols and not blocked[cell + offset]:
+                if dr and dc and (blocked[cell + dr * cols] or blocked[cell + dc]):
+                    continue
+                result.append((cell + offset, cost))
+        return result
+
+    def octile(self, a, b):
+        ar, ac = divmod(a, self.cols)
+        br, bc = divmod(b, self.cols)
+        dr, dc = abs(ar - br), abs(ac - bc)
+        return STRAIGHT * (dr + dc) + (DIAGONAL - 2 * STRAIGHT) * min(dr, dc)
+
+    # True when the straight line between two points stays in free cells, sampled every half cell
+    def line_of_sight(self, a, b):
+        h = self.resolution
+        steps = max(int(math.ceil(math.dist(a, b) / (h / 2))), 1)
+        for k in range(steps + 1):
+            t = k / steps
+            row = int((a[1] + (b[1] - a[1]) * t) / h)
+            col = int((a[0] + (b[0] - a[0]) * t) / h)
+            if not self.free(row, col):
+                return False
+        return True
+
+
+def _reconstruct(parents, goal):
+    route = [goal]
+    while parents[route[-1]] is not None:
+        route.append(parents[route[-1]])
+    route.reverse()
+    return route
+
+# A* search from start to goal cell that can be stopped and resumed, `route` is the list of cells
+# once it has finished (None when the goal can't be reached)
+# With jump_points the route holds only the jump points, the cells between them are in straight lines
+class AStarSearch:
+    def __init__(self, grid, start, goal, jump_points=False):
+        self.grid = grid
+        self.goal = goal
+        self.jump_points = jump_points
+        self.g = {start: 0}
+        self.parents = {start: None}
+        self.closed = set()
+        # Ties on f go to the deeper entry (larger g, stored negated), otherwise every cell of the band
+        # of equally short routes gets expanded
+        self.open_list = [(grid.octile(start, goal), 0, start)]
+        self.expanded = 0
+        self.done = False
+        self.route = None
+
+    # Expand cells until the goal is reached, or until `budget` seconds have passed
+    # Returns True once the search is done
+    def compute(self, budget=None):
+        if self.done:
+            return True
+        deadline = time.perf_counter() + budget if budget is not None else None
+        grid, goal, jump_points = self.grid, self.goal, self.jump_points
+        octile, successors = grid.octile, grid.neighbours
+        g, parents, closed, open_list = self.g, self.parents, self.closed, self.open_list
+        while open_list:
+            if deadline is not None and time.perf_counter() > deadline:
+                return False
+            _, cost, cell = heapq.heappop(open_list)
+            cost = -cost
+            if cell in closed:
+                continue
+            if cell == goal:
+                self.route = _reconstruct(parents, goal)
+                break
+            closed.add(cell)
+            self.expanded += 1
+            if jump_points:
+                steps = _jump_successors(grid, cell, parents[cell], goal)
+            else:
+                steps = successors(cell)
+            for nxt, step in steps:
+                new_cost = cost + step
+                if new_cost < g.get(nxt, INF):
+                    g[nxt] = new_cost
+                    parents[nxt] = cell
+                    heapq.heappush(open_list, (new_cost + octile(nxt, goal), -new_cost, nxt))
+        self.done = True
+        return True
+
+# Shortest route between two cells as a list of cells, or None when the goal can't be reached
+def astar(grid, start, goal, jump_points=False):
+    search = AStarSearch(grid, start, goal, jump_points)
+    search.compute()
+    return search.route, search.expanded
+
+# Jump point search successors for the no-corner-cutting 8-connected grid: prune the neighbours by
+# the direction of travel, then jump along each until reaching the goal, a forced neighbour or a wall
+def _jump_successors(grid, cell, parent, goal):
+    cols = grid.cols
+    row, col = divmod(cell, cols)
+    free = grid.free
+    if parent is None:
+        directions = [(dr, dc) for dr, dc, _, _ in grid.moves if free(row + dr, col + dc)
+                      and (not (dr and dc) or (free(row + dr, col) and free(row, col + dc)))]
+    else:
+        prow, pcol = divmod(parent, cols)
+        dr = (row > prow) - (row < prow)
+        dc = (col > pcol) - (col < pcol)
+        directions = []
+        if dr and dc:
+            if free(row + dr, col):
+                directions.append((dr, 0))
+            if free(row, col + dc):
+                directions.append((0, dc))
+            if free(row + dr, col) and free(row, col + dc):
+                directions.append((dr, dc))
+        elif dc:
+            ahead, up, down = free(row, col + dc), free(row - 1, col), free(row + 1, col)
+            if ahead:
+                directions.append((0, dc))
+                if up:
+                    directions.append((-1, dc))
+                if down:
+                    directions.append((1, dc))
+            if up:
+                directions.append((-1, 0))
+            if down:
+                directions.append((1, 0))
+        else:
+            ahead, left, right = free(row + dr, col), free(row, col - 1), free(row, col + 1)
+            if ahead:
+                directions.append((dr, 0))
+                if left:
+                    directions.append((dr, -1))
+                if right:
+                    directions.append((dr, 1))
+            if left:
+                directions.append((0, -1))
+            if right:
+                directions.append((0, 1))
+    result = []
+    goal_row, goal_col = divmod(goal, cols)
+    for dr, dc in directions:
+        found = _jump(grid, row, col, dr, dc, goal_row, goal_col)
+        if found is not None:
+            jr, jc = found
+            steps_r, steps_c = abs(jr - row), abs(jc - col)
+            result.append((jr * cols + jc, STRAIGHT * max(steps_r, steps_c) + (DIAGONAL - STRAIGHT) * min(steps_r, steps_c)))
+    return result
+
+def _jump_straight(free, row, col, dr, dc, goal_row, goal_col):
+    while True:
+        row, col = row + dr, col + dc
+        if not free(row, col):
+            return None
+        if row == goal_row and col == goal_col:
+            return row, col
+        if dc:
+            if (free(row - 1, col) and not free(row - 1, col - dc)) or (free(row + 1, col) and not free(row + 1, col - dc)):
+                return row, col
+        else:
+            if (free(row, col - 1) and not free(row - dr, col - 1)) or (free(row, col + 1) and not free(row - dr, col + 1)):
+                return row, col
+
+def _jump(grid, row, col, dr, dc, goal_row, goal_col):
+    free = grid.free
+    if not (dr and dc):
+        return _jump_straight(free, row, col, dr, dc, goal_row, goal_col)
+    while True:
+        row, col = row + dr, col + dc
+        if not free(row, col):
+            return None
+        if row == goal_row and col == goal_col:
+            return row, col
+        # A diagonal step is a jump point when either straight jump from it finds one
+        if (_jump_straight(free, row, col, dr, 0, goal_row, goal_col) is not None
+                or _jump_straight(free, row, col, 0, dc, goal_row, goal_col) is not None):
+            return row, col
+        if not (free(row + dr, col) and free(row, col + dc)):
+            return None
+
+
+# Drop every point the robot can skip: from each kept point, go to the furthest later point that is
+# in a straight line of sight
+def shortcut(grid, points):
+    if len(points) < 3:
+        return list(points)
+    result = [points[0]]
+    i = 0
+    while i < len(points) - 1:
+        j = len(points) - 1
+        while j > i + 1 and not grid.line_of_sight(points[i], points[j]):
+            j -= 1
+        result.append(points[j])
+        i = j
+    return result
+
+# Route from start to goal in field units, shortcut into pure pursuit waypoints (the start excluded)
+def plan(grid, start, goal, jump_points=False):
+    start_cell, goal_cell = grid.nearest_free(grid.cell(start)), grid.nearest_free(grid.cell(goal))
+    if start_cell is None or goal_cell is None:
+        return None
+    route, _ = astar(grid, start_cell, goal_cell, jump_points)
+    if route is None:
+        return None
+    return shortcut(grid, [tuple(start)] + [grid.point(cell) for cell in route[1:]])[1:]
+
+
+# A* working in field units for the window: start a plan, give it a slice of each frame until it is
+# done, then read off the shortcut waypoints
+class SlicedPlanner:
+    def __init__(self, field, radius=10, clearance=15, jump_points=False):
+        self.grid = PlanningGrid(field, radius, clearance)
+        self.jump_points = jump_points
+        self.search = None
+        self.pending = False
+        self.start_point = None
+
+    def set_goal(self, start, goal):
+        start_cell, goal_cell = self.grid.nearest_free(self.grid.cell(start)), self.grid.nearest_free(self.grid.cell(goal))
+        if start_cell is None or goal_cell is None:
+            self.pending = False
+            return False
+        self.start_point = tuple(start)
+        self.search = AStarSearch(self.grid, start_cell, goal_cell, self.jump_points)
+        self.pending = True
+        return True
+
+    # Run the search for up to `budget` seconds, returns True once it has finished
+    def compute(self, budget=None):
+        if self.pending and self.search.compute(budget):
+            self.pending = False
+        return not self.pending
+
+    def waypoints(self):
+        route = self.search.route
+        if route is None:
+            return None
+        return shortcut(self.grid, [self.start_point] + [self.grid.point(cell) for cell in route[1:]])[1:]
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tracking.obstacles import ObstacleMap, load_obstacles
+
+    parser = argparse.ArgumentParser(description="Compare the planners on an obstacle file")
+    parser.add_argument("obstacles", nargs="?", help="obstacle JSON file (default: border walls only)")
+    parser.add_argument("--resolution", type=float, default=4.0)
+    args = parser.parse_args()
+
+    field = ObstacleMap(load_obstacles(args.obstacles) if args.obstacles else [], resolution=args.resolution)
+    grid = PlanningGrid(field)
+    start, goal = (100, 325), (920, 600)
+    s, t = grid.nearest_free(grid.cell(start)), grid.nearest_free(grid.cell(goal))
+    print(f"{grid.cols}x{grid.rows} grid, planning {start} -> {goal}")
+    for label, jump in (("A*", False), ("jump point search", True)):
+        begin = time.perf_counter()
+        route, expanded = astar(grid, s, t, jump)
+        elapsed = time.perf_counter() - begin
+        points = [grid.point(cell) for cell in route]
+        length = sum(math.dist(a, b) for a, b in zip(points, points[1:]))
+        print(f"{label:>18}: {elapsed * 1000:7.1f}ms, {expanded} cells expanded, route length {length:.1f}")
+    begin = time.perf_counter()
+    waypoints = plan(grid, start, goal)
+    print(f"{'shortcut waypoints':>18}: {(time.perf_counter() - begin) * 1000:7.1f}ms with A*, "
+          f"{len(waypoints)} waypoints {[(round(x), round(y)) for x, y in waypoints]}")
+
+    for label, jump in (("A* in slices", False), ("JPS in slices", True)):
+        planner = SlicedPlanner(field, jump_points=jump)
+        planner.set_goal(start, goal)
+        slices = []
+        while True:
+            begin = time.perf_counter()
+            done = planner.compute(budget=0.004)
+            slices.append(time.perf_counter() - begin)
+            if done:
+                break
+        print(f"{label:>18}: {sum(slices) * 1000:7.1f}ms in {len(slices)} frame slices of 4ms, longest "
+              f"{max(slices) * 1000:.1f}ms, {len(planner.waypoints())} waypoints")
@@ -0,0 +1,198 @@
+#----------------
+# Per-phase frame timing for the window loop
+# Call start_frame() at the top of the loop, mark(name) after each phase and end_frame() at the bottom
+# Every phase keeps a rolling histogram of its last `window` frames (log-spaced bins, so adding a
+# sample is a couple of list updates) from which p50/p95/p99 are read
+# When disabled, every call returns straight away
+# ProfilerOverlay draws the numbers on screen, export() writes them to JSON and
+# `python -m tracking.profiler profile.json` prints an exported file
+#----------------
+
+import json
+import math
+import time
+
+IDLE = "idle"  # Phase spent waiting for the next frame, everything else counts against the budget
+
+# Histogram bins in milliseconds: 20 per decade from 1us to 10s
+BINS_PER_DECADE = 20
+MIN_EXPONENT = -3
+BIN_COUNT = 7 * BINS_PER_DECADE
+BIN_EDGES = [10 ** (MIN_EXPONENT + i / BINS_PER_DECADE) for i in range(BIN_COUNT + 1)]
+
+# Histogram of the last `window` samples, the oldest sample is taken out as each new one comes in
+class RollingHistogram:
+    def __init__(self, window=600):
+        self.window = window
+        self.counts = [0] * BIN_COUNT
+        self.bins = [0] * window  # Bin of each sample in the window, as a ring
+        self.values = [0.0] * window
+        self.added = 0
+        self.total = 0.0
+
+    def add(self, ms):
+        if ms > 0:
+            index = min(max(int((math.log10(ms) - MIN_EXPONENT) * BINS_PER_DECADE), 0), BIN_COUNT - 1)
+        else:
+            index = 0
+        slot = self.added % self.window
+        if self.added >= self.window:
+            self.counts[self.bins[slot]] -= 1
+            self.total -= self.values[slot]
+        self.counts[index] += 1
+        self.bins[slot] = index
+        self.values[slot] = ms
+        self.total += ms
+        self.added += 1
+
+    def __len__(self):
+        return min(self.added, self.window)
+
+    def mean(self):
+        return self.total / len(self) if len(self) else 0.0
+
+    # Value below which q percent of the window falls, to within a bin (about 12%)
+    def percentile(self, q):
+        needed = q / 100 * len(self)
+        seen = 0
+        for index, count in enumerate(self.counts):
+            seen += count
+            if count and seen >= needed:
+                return math.sqrt(BIN_EDGES[index] * BIN_EDGES[index + 1])
+        return 0.0
+
+
+class Profiler:
+    def __init__(self, enabled=False, window=600, frame_budget=1 / 60):
+        self.enabled = enabled
+        self.window = window
+        self.frame_budget = frame_budget
+        self.phases = {}  # Phase name -> RollingHistogram, in the order phases were first marked
+        self.frame = RollingHistogram(window)
+        self.busy = RollingHistogram(window)
+        self.frames = 0
+        self.frame_start = None
+        self.last = None
+        self.idle = 0.0
+
+    def toggle(self):
+        self.enabled = not self.enabled
+        self.frame_start = None
+        self.last = None
+
+    def start_frame(self):
+        if not self.enabled:
+            return
+        self.frame_start = self.last = time.perf_counter()
+        self.idle = 0.0
+
+    # Record the time since the previous mark (or the start of the frame) as phase `name`
+    def mark(self, name):
+        if not self.enabled or self.last is None:
+            return
+        now = time.perf_counter()
+        elapsed = (now - self.last) * 1000
+        histogram = self.phases.get(name)
+        if histogram is None:
+            histogram = self.phases[name] = RollingHistogram(self.window)
+        histogram.add(elapsed)
+        if name == IDLE:
+            self.idle += elapsed
+        self.last = now
+
+    def end_frame(self):
+        if not self.enabled or self.frame_start is None:
+            return
+        total = (time.perf_counter() - self.frame_start) * 1000
+        self.frame.add(total)
+        self.busy.add(total - self.idle)
+        self.frames += 1
+
+    # Percentiles in ms of every phase, the whole frame and the busy (non-idle) part of it
+    def summary(self):
+        rows = {name: histogram for name, histogram in self.phases.items()}
+        rows["frame"] = self.frame
+        rows["busy"] = self.busy
+        return {name: {"p50": h.percentile(50), "p95": h.percentile(95), "p99": h.percentile(99),
+                       "mean": h.mean(), "samples": len(h)} for name, h in rows.items()}
+
+    # Frame budget left over at each busy percentile, negative when frames run late
+    def headroom(self):
+        budget = self.frame_budget * 1000
+        return {q: budget - self.busy.percentile(int(q[1:])) for q in ("p50", "p95", "p99")}
+
+    def export(self, path):
+        histograms = {name: h.counts for name, h in self.phases.items()}
+        histograms["frame"] = self.frame.counts
+        histograms["busy"] = self.busy.counts
+        with open(path, "w") as f:
+            json.dump({
+                "frame_budget_ms": self.frame_budget * 1000,
+                "frames": self.frames,
+                "window": self.window,
+                "phases": self.summary(),
+                "headroom_ms": self.headroom(),
+                "bin_edges_ms": BIN_EDGES,
+                "histograms": histograms,
+            }, f, indent=2)
+
+
+# On-screen table of the profiler's percentiles
+# The table is rendered to its own surface a few times a second and just blitted in between, so the
+# overlay costs next to nothing on the frames it measures
+class ProfilerOverlay:
+    def __init__(self, profiler, text, pos, refresh=15, background=(230, 230, 230)):
+        self.profiler = profiler
+        self.text = text  # TextRenderer, the numbers come from its digit atlas
+        self.pos = pos
+        self.refresh = refresh
+        self.background = background
+        self.surface = None
+        self.frames = 0
+
+    def _render(self):
+        import pygame
+
+        summary = self.profiler.summary()
+        headroom = self.profiler.headroom()
+        rows = [(name, (row["p50"], row["p95"], row["p99"])) for name, row in summary.items()]
+        rows.append(("headroom", (headroom["p50"], headroom["p95"], headroom["p99"])))
+        line = 20
+        surface = pygame.Surface((300, line * (len(rows) + 1) + 10))
+        surface.fill(self.background)
+        self.text.draw(surface, "ms", (10, 5))
+        for column, heading in enumerate(("p50", "p95", "p99")):
+            self.text.draw(surface, heading, (110 + column * 65, 5))
+        for row, (name, values) in enumerate(rows, 1):
+            self.text.draw(surface, name, (10, 5 + row * line))
+            for column, value in enumerate(values):
+                self.text.atlas.draw(surface, f"{value:.2f}", (110 + column * 65, 5 + row * line))
+        return surface
+
+    # Returns the rect drawn, or None while the profiler is off
+    def draw(self, screen):
+        if not self.profiler.enabled:
+            self.surface = None
+            return None
+        if self.surface is None or self.frames % self.refresh == 0:
+            self.surface = self._render()
+        self.frames += 1
+        return screen.blit(self.surface, self.pos)
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Print a profile exported by the visualization tools")
+    parser.add_argument("profile")
+    args = parser.parse_args()
+
+    with open(args.profile) as f:
+        profile = json.load(f)
+    print(f"{profile['frames']} frames, budget {profile['frame_budget_ms']:.2f}ms, "
+          f"percentiles over the last {profile['window']}")
+    print(f"{'phase':<14}{'p50':>9}{'p95':>9}{'p99':>9}{'mean':>9}")
+    for name, row in profile["phases"].items():
+        print(f"{name:<14}{row['p50']:>9.3f}{row['p95']:>9.3f}{row['p99']:>9.3f}{row['mean']:>9.3f}")
+    headroom = profile["headroom_ms"]
+    print(f"{'headroom':<14}{headroom['p50']:>9.3f}{headroom['p95']:>9.3f}{headroom['p99']:>9.3f}")
@@ -0,0 +1,202 @@
+#----------------
+# Regression runner for controller behaviour
+# Every JSON file in a scenario directory (default scenarios/) describes one course, or a list of them,
+# with the outcome it is expected to have:
+#   {"name": "straight", "start": [100, 325], "heading": 0, "mode": "moveToPoint",
+#    "params": {"speed": 2, "turn_speed": 0.05}, "targets": [[900, 325]],
+#    "expect": {"time": [6.5, 7.5], "overshoot": 1, "final_error": 20}}
+# mode is moveToPoint (visits `targets` in turn), pure_pursuit or mpc (follow `waypoints`)
+# params are Simulation arguments (see tracking.sweep.PARAMETERS, turn_threshold is in radians)
+# obstacles optionally names an obstacle file, relative to the scenario file
+# expect bounds any metric of tracking.sweep.run_scenario (time in simulated seconds, path_length,
+# overshoot, final_error, collisions) with a maximum or a [min, max] pair, and every scenario has to
+# finish within max_ticks (default 20000) without hitting an obstacle, within the controller's
+# tolerance of its last target
+# Scenarios run headless on all cores. Results are cached by a hash of the scenario and of the tracking
+# package's source, so a rerun only simulates what changed
+#   python -m tracking.regression                      run scenarios/, exit code 1 on failures
+#   python -m tracking.regression DIR --report FILE    also write the report as JSON
+#----------------
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import glob
+import hashlib
+import json
+import os
+import time
+
+from tracking.obstacles import load_obstacles
+from tracking.sweep import METRICS, PARAMETERS, run_scenario
+
+PACKAGE_DIR = os.path.dirname(os.path.abspath(__file__))
+SCENARIO_DIR = os.path.join(PACKAGE_DIR, "..", "scenarios")
+CACHE_FILE = "regression_cache.json"
+MODES = ("moveToPoint", "pure_pursuit", "mpc")
+SCENARIO_PARAMETERS = PARAMETERS + ("smooth_paths", "robot_radius")
+SCENARIO_KEYS = ("name", "description", "start", "heading", "mode", "params", "targets", "waypoints",
+                 "obstacles", "max_ticks", "expect")
+BOUNDED_METRICS = tuple(m for m in METRICS if m != "completed")
+MAX_TICKS = 20000
+
+# Check one scenario and resolve its obstacle file to the shapes, so the cache key covers the field too
+def validate(scenario, source):
+    def fail(message):
+        raise ValueError(f"{source}: scenario {scenario.get('name', '?')!r}: {message}")
+
+    if not isinstance(scenario, dict):
+        raise ValueError(f"{source}: expected a scenario object, got {scenario!r}")
+    unknown = set(scenario) - set(SCENARIO_KEYS)
+    if unknown:
+        fail(f"unknown keys {', '.join(sorted(unknown))}")
+    for key in ("name", "start", "mode"):
+        if key not in scenario:
+            fail(f"missing {key!r}")
+    mode = scenario["mode"]
+    if mode not in MODES:
+        fail(f"mode must be one of {', '.join(MODES)}")
+    points = "targets" if mode == "moveToPoint" else "waypoints"
+    other = "waypoints" if mode == "moveToPoint" else "targets"
+    if not scenario.get(points) or other in scenario:
+        fail(f"{mode} needs a non-empty {points!r} list and no {other!r}")
+    unknown = set(scenario.get("params", {})) - set(SCENARIO_PARAMETERS)
+    if unknown:
+        fail(f"unknown params {', '.join(sorted(unknown))}, expected {', '.join(SCENARIO_PARAMETERS)}")
+    for metric, bound in scenario.get("expect", {}).items():
+        if metric not in BOUNDED_METRICS:
+            fail(f"can't bound {metric!r}, expected one of {', '.join(BOUNDED_METRICS)}")
+        if not (isinstance(bound, (int, float)) or (isinstance(bound, list) and len(bound) == 2)):
+            fail(f"bound for {metric!r} must be a maximum or a [min, max] pair")
+    if isinstance(scenario.get("obstacles"), str):
+        field = os.path.join(os.path.dirname(source), scenario["obstacles"])
+        scenario = dict(scenario, obstacles=load_obstacles(field))
+    return scenario
+
+# Every scenario in the directory's JSON files, in file name order
+def load_scenarios(directory):
+    scenarios = []
+    names = set()
+    for path in sorted(glob.glob(os.path.join(directory, "*.json"))):
+        with open(path) as f:
+            loaded = json.load(f)
+        for scenario in loaded if isinstance(loaded, list) else [loaded]:
+            scenario = validate(scenario, path)
+            if scenario["name"] in names:
+                raise ValueError(f"{path}: duplicate scenario name {scenario['name']!r}")
+            names.add(scenario["name"])
+            scenarios.append(scenario)
+    return scenarios
+
+# Hash of every module in the tracking package, any change to the code reruns every scenario
+def code_hash():
+    digest = hashlib.sha256()
+    for path in sorted(glob.glob(os.path.join(PACKAGE_DIR, "*.py"))):
+        digest.update(os.path.basename(path).encode())
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()
+
+# Hash of what a scenario simulates, its name, description and bounds can change without a rerun
+def scenario_hash(scenario):
+    simulated = {key: value for key, value in scenario.items() if key not in ("name", "description", "expect")}
+    return hashlib.sha256(json.dumps(simulated, sort_keys=True).encode()).hexdigest()
+
+# Run one scenario (one process pool task)
+def run_case(scenario):
+    params = dict(scenario.get("params", {}))
+    if scenario.get("obstacles") is not None:
+        params["obstacles"] = scenario["obstacles"]
+    if scenario["mode"] == "mpc":
+        params["mpc"] = {}
+    return run_scenario(scenario, params, scenario.get("max_ticks", MAX_TICKS))
+
+# Outcomes that fall outside the scenario's expected bounds
+def check(scenario, result):
+    failures = []
+    if result["collisions"]:
+        failures.append(f"ran into an obstacle ({result['collisions']} collisions)")
+    elif not result["completed"]:
+        failures.append(f"did not stop within tolerance of the last target in {scenario.get('max_ticks', MAX_TICKS)} "
+                        "ticks")
+    for metric, bound in scenario.get("expect", {}).items():
+        low, high = bound if isinstance(bound, list) else (None, bound)
+        value = result[metric]
+        if low is not None and value < low:
+            failures.append(f"{metric} {value:.3g} < {low}")
+        if high is not None and value > high:
+            failures.append(f"{metric} {value:.3g} > {high}")
+    return failures
+
+# Results cached for this version of the code, anything cached for other versions is dropped
+def load_cache(path, code):
+    try:
+        with open(path) as f:
+            cache = json.load(f)
+    except (OSError, ValueError):
+        return {}
+    return cache["results"] if cache.get("code") == code else {}
+
+def save_cache(path, code, results):
+    with open(path, "w") as f:
+        json.dump({"code": code, "results": results}, f, indent=1, sort_keys=True)
+
+# Run every scenario that isn't cached and check them all
+# Returns one report entry per scenario, in the order given
+def run_scenarios(scenarios, workers=None, cache_path=CACHE_FILE):
+    code = code_hash()
+    cached = load_cache(cache_path, code) if cache_path else {}
+    keys = [scenario_hash(scenario) for scenario in scenarios]
+    results = {key: cached[key] for key in keys if key in cached}
+    pending = [(key, scenario) for key, scenario in zip(keys, scenarios) if key not in results]
+    if pending:
+        with ProcessPoolExecutor(workers) as pool:
+            futures = {pool.submit(run_case, scenario): key for key, scenario in pending}
+            for future in as_completed(futures):
+                results[futures[future]] = future.result()
+    if cache_path:
+        save_cache(cache_path, code, results)
+
+    report = []
+    for key, scenario in zip(keys, scenarios):
+        failures = check(scenario, results[key])
+        report.append({"name": scenario["name"], "mode": scenario["mode"], "passed": not failures,
+                       "cached": key in cached, "failures": failures, **results[key]})
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run the controller regression scenarios headless")
+    parser.add_argument("directory", nargs="?", default=SCENARIO_DIR, help="directory of scenario JSON files")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--cache", default=CACHE_FILE, help=f"result cache file (default {CACHE_FILE})")
+    parser.add_argument("--no-cache", action="store_true", help="run every scenario and leave the cache alone")
+    parser.add_argument("--report", metavar="FILE", help="write the report to FILE as JSON")
+    args = parser.parse_args()
+
+    try:
+        scenarios = load_scenarios(args.directory)
+    except ValueError as error:
+        raise SystemExit(str(error))
+    if not scenarios:
+        raise SystemExit(f"no scenarios in {args.directory}")
+    start = time.perf_counter()
+    report = run_scenarios(scenarios, args.workers, None if args.no_cache else args.cache)
+    elapsed = time.perf_counter() - start
+
+    width = max(len(entry["name"]) for entry in report)
+    for entry in report:
+        status = "ok  " if entry["passed"] else "FAIL"
+        line = (f"{status} {entry['name']:<{width}} {entry['mode']:>12}: {entry['time']:6.2f}s, "
+                f"overshoot {entry['overshoot']:5.1f}, final error {entry['final_error']:5.1f}, "
+                f"path {entry['path_length']:6.0f}{' (cached)' if entry['cached'] else ''}")
+        print(line)
+        for failure in entry["failures"]:
+            print(f"       {failure}")
+    failed = sum(not entry["passed"] for entry in report)
+    cached = sum(entry["cached"] for entry in report)
+    print(f"{len(report) - failed} passed, {failed} failed, {len(report) - cached} run and {cached} cached "
+          f"in {elapsed:.1f}s")
+    if args.report:
+        with open(args.report, "w") as f:
+            json.dump({"code": code_hash(), "scenarios": report}, f, indent=1)
+    raise SystemExit(1 if failed else 0)
@@ -0,0 +1,115 @@
+#----------------
+# Incremental rendering helpers
+# TrajectoryLayer keeps every path in a TrajectoryStore baked into an off-screen surface, so a frame only
+# draws the segments added since the last frame instead of the whole history
+# DirtyScreen restores and pushes only the parts of the window that changed
+#----------------
+
+import pygame
+
+WHITE = (255, 255, 255)
+BLACK = (0, 0, 0)
+
+# Off-screen surface holding the saved trajectories and the live path of a TrajectoryStore
+# underlay is an optional surface of static scenery (e.g. obstacles) drawn under the paths
+class TrajectoryLayer:
+    def __init__(self, size, background=WHITE, color=BLACK, underlay=None):
+        self.surface = pygame.Surface(size)
+        self.background = background
+        self.underlay = underlay
+        self.color = color
+        self.needs_rebuild = True
+        self.generation = None  # Store generation the surface was built from
+        self.saved_total = 0  # Number of saved trajectories already on the surface
+        self.live_serial = None  # Live path currently being drawn incrementally
+        self.live_drawn = 0  # Number of points of the live path already on the surface
+
+    # Force a full redraw on the next sync (e.g. after a reset)
+    def invalidate(self):
+        self.needs_rebuild = True
+
+    def _draw_path(self, path, start=0):
+        if len(path) - start > 1:
+            return pygame.draw.lines(self.surface, self.color, False, path[start:].tolist(), 1)
+        return None
+
+    # Bring the surface up to date with the store
+    # Returns the list of changed rects, or None when the whole surface was redrawn
+    def sync(self, store):
+        live = store.live()
+
+        # Anything that was drawn and has since gone away means the surface has to be rebuilt
+        if self.needs_rebuild or store.generation != self.generation:
+            self.surface.fill(self.background)
+            if self.underlay is not None:
+                self.surface.blit(self.underlay, (0, 0))
+            for traj in store.saved():
+                self._draw_path(traj)
+            self._draw_path(live)
+            self.generation = store.generation
+            self.saved_total = store.saved_total
+            self.live_serial = store.live_serial
+            self.live_drawn = len(live)
+            self.needs_rebuild = False
+            return None
+
+        dirty = []
+        # Newly saved trajectories are normally the previous live path, drawing them again
+        # just fills in the last few points that were added after the previous frame
+        new_saved = min(store.saved_total - self.saved_total, len(store))
+        if new_saved > 0:
+            for traj in store.saved()[-new_saved:]:
+                rect = self._draw_path(traj)
+                if rect:
+                    dirty.append(rect)
+        self.saved_total = store.saved_total
+
+        if store.live_serial != self.live_serial:
+            self.live_serial = store.live_serial
+            self.live_drawn = 0
+        # Draw only the segments added since the last frame, starting one segment back because
+        # decimation may have slid the tail point forward
+        rect = self._draw_path(live, max(self.live_drawn - 2, 0))
+        if rect:
+            dirty.append(rect)
+        self.live_drawn = len(live)
+        return dirty
+
+
+# Tracks what was drawn on top of the background each frame so only those areas get redrawn
+class DirtyScreen:
+    def __init__(self, screen, layer):
+        self.screen = screen
+        self.layer = layer
+        self.previous = []  # Foreground rects drawn last frame
+        self.current = []
+        self.dirty = []
+        self.full_update = True
+
+    # Start a frame: sync the background and erase last frame's foreground
+    def begin(self, store):
+        changed = self.layer.sync(store)
+        if changed is None or self.full_update:
+            self.screen.blit(self.layer.surface, (0, 0))
+            self.full_update = True
+            self.dirty = []
+        else:
+            self.dirty = changed + self.previous
+            for rect in self.dirty:
+                self.screen.blit(self.layer.surface, rect, rect)
+        self.current = []
+
+    # Record a rect that was drawn on top of the background this frame
+    def add(self, rect):
+        if rect:
+            self.current.append(rect)
+        return rect
+
+    # Push the changed areas to the display
+    def finish(self):
+        if self.full_update:
+            pygame.display.flip()
+            self.full_update = False
+        else:
+            pygame.display.update(self.dirty + self.current)
+        self.previous = self.current
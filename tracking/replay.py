@@ -0,0 +1,201 @@
+#----------------
+# Record and replay of simulation runs
+# A log is a small JSON header with the Simulation settings followed by fixed-width 80 byte records:
+# one per input (new target with its final heading, waypoint, start pure pursuit, reset) and one per tick with the
+# slider values used and the pose after the tick. A side file holds the record number of every
+# tick, so any tick is found in O(1), and the records are read back memory-mapped
+# Attach a LogWriter to Simulation.recorder to record, replay() re-runs a log headless and checks
+# every pose matches bit for bit
+# Run `python -m tracking.replay run.vtlog` to verify a log, add --seek N to print one tick
+#----------------
+
+import argparse
+import json
+import math
+import struct
+
+import numpy as np
+
+MAGIC = b"VTLOG1\0\0"
+
+# Record kinds
+TICK = 0
+SET_TARGET = 1
+ADD_WAYPOINT = 2
+START_PURE_PURSUIT = 3
+RESET = 4
+
+# Controller running during a tick
+IDLE = 0
+MOVE_TO_POINT = 1
+PURE_PURSUIT = 2
+
+RECORD_DTYPE = np.dtype([
+    ("kind", "<u1"),
+    ("mode", "<u1"),
+    ("pad", "<u2"),
+    ("waypoints", "<u4"),  # Number of pure pursuit points when the record was written
+    ("tick", "<u8"),
+    ("x", "<f8"),  # Robot pose after a tick, or the point of a target/waypoint record
+    ("y", "<f8"),
+    ("angle", "<f8"),
+    ("target_x", "<f8"),  # NaN when there is no moveToPoint target
+    ("target_y", "<f8"),
+    ("speed", "<f8"),
+    ("turn_speed", "<f8"),
+    ("ramp_speed", "<f8"),  # Speed held by the acceleration limiter, NaN without one
+])
+INDEX_DTYPE = np.dtype("<u8")
+
+def index_path(path):
+    return str(path) + ".idx"
+
+def mode_of(sim):
+    if sim.pure_pursuit_active:
+        return PURE_PURSUIT
+    if sim.is_moving and sim.target_pos is not None:
+        return MOVE_TO_POINT
+    return IDLE
+
+# Appends records to a log through a preallocated buffer, writing to disk once it fills up
+class LogWriter:
+    def __init__(self, path, config, buffer_size=4096):
+        self.path = path
+        self.file = open(path, "wb")
+        self.index_file = open(index_path(path), "wb")
+        header = json.dumps(config).encode()
+        header += b" " * (-(len(MAGIC) + 4 + len(header)) % 8)  # Keep the records 8 byte aligned
+        self.file.write(MAGIC + struct.pack("<I", len(header)) + header)
+        self.buffer = np.zeros(buffer_size, dtype=RECORD_DTYPE)
+        self.index = np.zeros(buffer_size, dtype=INDEX_DTYPE)
+        self.buffered = 0
+        self.buffered_ticks = 0
+        self.records = 0  # Records written so far, including buffered ones
+
+    # Write one record into the buffer as a single tuple assignment, which is much cheaper than
+    # setting the fields one at a time
+    def _write(self, kind, sim, tick, x=math.nan, y=math.nan, angle=math.nan):
+        if self.buffered == len(self.buffer):
+            self.flush()
+        target_x, target_y = sim.target_pos if sim.target_pos else (math.nan, math.nan)
+        ramp_speed = sim.ramp.speed if sim.ramp else math.nan
+        self.buffer[self.buffered] = (kind, mode_of(sim), 0, len(sim.pure_pursuit_points), tick, x, y, angle,
+                                      target_x, target_y, sim.speed, sim.turn_speed, ramp_speed)
+        self.buffered += 1
+        self.records += 1
+
+    # Inputs are recorded just before the simulation applies them
+    def on_set_target(self, sim, pos, heading=None):
+        self._write(SET_TARGET, sim, sim.ticks, pos[0], pos[1], math.nan if heading is None else heading)
+
+    def on_add_waypoint(self, sim, pos):
+        self._write(ADD_WAYPOINT, sim, sim.ticks, pos[0], pos[1])
+
+    def on_start_pure_pursuit(self, sim):
+        self._write(START_PURE_PURSUIT, sim, sim.ticks)
+
+    def on_reset(self, sim):
+        self._write(RESET, sim, sim.ticks)
+
+    # Record the state after a tick along with the slider values it ran with
+    def on_tick(self, sim):
+        if self.buffered_ticks == len(self.index):
+            self.flush()
+        self.index[self.buffered_ticks] = self.records
+        self.buffered_ticks += 1
+        self._write(TICK, sim, sim.ticks - 1, sim.robot_pos[0], sim.robot_pos[1], sim.robot_angle)
+
+    def flush(self):
+        self.file.write(self.buffer[:self.buffered].tobytes())
+        self.index_file.write(self.index[:self.buffered_ticks].tobytes())
+        self.buffered = 0
+        self.buffered_ticks = 0
+        self.file.flush()
+        self.index_file.flush()
+
+    def close(self):
+        if not self.file.closed:
+            self.flush()
+            self.file.close()
+            self.index_file.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+# Memory-mapped view of a finished log
+class LogReader:
+    def __init__(self, path):
+        with open(path, "rb") as f:
+            if f.read(len(MAGIC)) != MAGIC:
+                raise ValueError(f"{path} is not a simulation log")
+            (header_len,) = struct.unpack("<I", f.read(4))
+            self.config = json.loads(f.read(header_len))
+        offset = len(MAGIC) + 4 + header_len
+        self.records = np.memmap(path, dtype=RECORD_DTYPE, mode="r", offset=offset)
+        self.index = np.fromfile(index_path(path), dtype=INDEX_DTYPE)
+
+    # Number of ticks in the log
+    def __len__(self):
+        return len(self.index)
+
+    # The record of a tick, found through the index
+    def tick(self, n):
+        return self.records[self.index[n]]
+
+
+# Run a log's inputs through a fresh Simulation and compare every tick with the recording
+# Returns the first tick that differs, or None when the replay matches exactly
+def replay(path):
+    from tracking.simulation import Simulation
+
+    log = LogReader(path)
+    sim = Simulation(**log.config)
+    for record in log.records:
+        kind = record["kind"]
+        if kind == SET_TARGET:
+            # The angle enforcement variant sizes its approach from the sliders when the target is set,
+            # and they can have moved since the last tick
+            sim.speed = float(record["speed"])
+            sim.turn_speed = float(record["turn_speed"])
+            heading = float(record["angle"])
+            sim.set_target((float(record["x"]), float(record["y"])), None if math.isnan(heading) else heading)
+        elif kind == ADD_WAYPOINT:
+            sim.add_waypoint((float(record["x"]), float(record["y"])))
+        elif kind == START_PURE_PURSUIT:
+            sim.start_pure_pursuit()
+        elif kind == RESET:
+            sim.reset()
+        elif kind == TICK:
+            sim.speed = float(record["speed"])
+            sim.turn_speed = float(record["turn_speed"])
+            sim.step()
+            if (sim.robot_pos[0] != record["x"] or sim.robot_pos[1] != record["y"]
+                    or sim.robot_angle != record["angle"]):
+                return int(record["tick"])
+    return None
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Verify or inspect a simulation log")
+    parser.add_argument("log")
+    parser.add_argument("--seek", type=int, help="print the state at this tick instead of replaying")
+    args = parser.parse_args()
+
+    if args.seek is not None:
+        record = LogReader(args.log).tick(args.seek)
+        mode = {IDLE: "idle", MOVE_TO_POINT: "moveToPoint", PURE_PURSUIT: "pure pursuit"}[int(record["mode"])]
+        print(f"Tick {int(record['tick'])}: robot {record['x']:.3f}, {record['y']:.3f}, "
+              f"{math.degrees(record['angle']):.2f} deg, {mode}, target {record['target_x']:.1f}, "
+              f"{record['target_y']:.1f}, speed {record['speed']:.2f}, turn speed {record['turn_speed']:.3f}")
+    else:
+        mismatch = replay(args.log)
+        ticks = len(LogReader(args.log))
+        if mismatch is None:
+            print(f"Replayed {ticks} ticks, every pose matches")
+        else:
+            print(f"Replay diverged at tick {mismatch}")
+            raise SystemExit(1)
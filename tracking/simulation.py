@@ -0,0 +1,321 @@
+#----------------
+# Simulation state and the per-tick update shared by the window and headless runs
+# One call to step() is one fixed controller tick (see tracking.timestep)
+# Run headless: python -m tracking.simulation --target 800,200
+#           or: python -m tracking.simulation --waypoints 600,300 800,100 900,500
+#----------------
+
+import argparse
+import math
+import time
+
+from tracking.approach import approach_angle, approach_point, approach_radius, approach_table
+from tracking.controllers import TARGET_RADIUS, TURN_THRESHOLD, model_predictive, move_robot_with_pid, pure_pursuit
+from tracking.localization import Localizer
+from tracking.mpc import MPPIController
+from tracking.obstacles import ObstacleMap
+from tracking.path import Path
+from tracking.smoothing import generate_path
+from tracking.timestep import SIM_DT
+from tracking.trajectory import TrajectoryStore
+from tracking.velocity import SpeedRamp, traversal_time
+
+# All of the robot and controller state lives on the instance, the fixed attribute set (__slots__)
+# keeps it compact and cheap to access every tick and catches misspelled attributes
+class Simulation:
+    __slots__ = ("config", "robot_pos", "robot_angle", "speed", "turn_speed", "pursuit_speed", "smooth_paths",
+                 "max_accel", "ramp", "lookahead_distance", "final_point_tolerance", "turn_threshold",
+                 "target_radius", "target_pos", "target_heading", "approach_pos", "is_moving", "initial_pos",
+                 "initial_angle", "paths", "pure_pursuit_points", "pure_pursuit_path", "pure_pursuit_active",
+                 "ticks", "run_start_tick", "last_run_time", "planned_time", "recorder", "localizer",
+                 "drive_on_estimate", "obstacles", "robot_radius", "collisions", "mpc")
+
+    def __init__(self, robot_pos, robot_angle=0, speed=2, turn_speed=0.05,
+                 pursuit_speed=2, lookahead_distance=50, final_point_tolerance=5, paths=None,
+                 smooth_paths=True, max_accel=None, turn_threshold=TURN_THRESHOLD, target_radius=TARGET_RADIUS,
+                 localization=None, drive_on_estimate=False, obstacles=None, robot_radius=10, mpc=None):
+        # Settings that recreate this simulation from its starting state (see tracking.replay)
+        self.config = dict(robot_pos=[float(v) for v in robot_pos], robot_angle=robot_angle, speed=speed,
+                           turn_speed=turn_speed, pursuit_speed=pursuit_speed,
+                           lookahead_distance=lookahead_distance, final_point_tolerance=final_point_tolerance,
+                           smooth_paths=smooth_paths, max_accel=max_accel, turn_threshold=turn_threshold,
+                           target_radius=target_radius, localization=localization,
+                           drive_on_estimate=drive_on_estimate, obstacles=obstacles, robot_radius=robot_radius,
+                           mpc=mpc)
+        self.robot_pos = list(robot_pos)
+        self.robot_angle = robot_angle
+        self.speed = speed  # moveToPoint speed (movement speed slider)
+        self.turn_speed = turn_speed  # moveToPoint turn speed (turn speed slider)
+        self.pursuit_speed = pursuit_speed  # Pure pursuit forward speed (top speed on smoothed paths)
+        self.smooth_paths = smooth_paths  # Smooth the waypoints and slow down for curves
+        self.max_accel = max_accel  # Speed change per tick, None applies speed changes instantly
+        self.ramp = SpeedRamp(max_accel) if max_accel else None
+        self.lookahead_distance = lookahead_distance  # Distance for Pure Pursuit lookahead
+        self.final_point_tolerance = final_point_tolerance  # Tolerance for stopping at the final point
+        self.turn_threshold = turn_threshold  # Heading error below which the controllers stop turning
+        self.target_radius = target_radius  # moveToPoint stops inside this radius of the target
+
+        # Tracking variables
+        self.target_pos = None
+        self.target_heading = None  # Final heading the angle enforcement variant finishes on, None for performance
+        self.approach_pos = None  # Point it drives to first, None once it is heading for the target itself
+        self.is_moving = False
+        self.initial_pos = self.robot_pos.copy()  # Save the initial position for trajectory
+        self.initial_angle = robot_angle  # Save the initial heading
+        self.paths = paths if paths is not None else TrajectoryStore()  # Saved trajectories and the current path
+
+        # Pure pursuit points
+        self.pure_pursuit_points = []
+        self.pure_pursuit_path = None  # Path built from the points when pure pursuit starts
+        self.pure_pursuit_active = False  # Active state for Pure Pursuit running
+
+        self.ticks = 0
+        self.run_start_tick = 0
+        self.last_run_time = None  # Simulated seconds the last finished moveToPoint or pure pursuit took
+        self.planned_time = None  # Simulated seconds the current pure pursuit path is planned to take
+        self.recorder = None  # Optional tracking.replay.LogWriter that records inputs and ticks
+
+        # Particle filter estimate of the pose from noisy sensors, localization is a dict of
+        # tracking.localization.Localizer settings (None runs without one)
+        self.localizer = Localizer((*self.robot_pos, robot_angle), **localization) if localization is not None else None
+        self.drive_on_estimate = drive_on_estimate and self.localizer is not None  # Steer from the estimate
+
+        # Static obstacles (shapes as in tracking.obstacles), a move that would take the robot's
+        # footprint into one is undone and the run stopped
+        self.obstacles = ObstacleMap(obstacles) if obstacles is not None else None
+        self.robot_radius = robot_radius
+        self.collisions = 0
+
+        # Pure pursuit paths are followed by the MPPI model predictive controller instead when mpc is a
+        # dict of tracking.mpc.MPPIController settings (None uses pure pursuit)
+        self.mpc = None
+        if mpc is not None:
+            settings = dict(max_speed=pursuit_speed, max_accel=max_accel or pursuit_speed, obstacles=self.obstacles,
+                            radius=robot_radius)
+            settings.update(mpc)
+            self.mpc = MPPIController(**settings)
+
+    @property
+    def sim_time(self):
+        return self.ticks * SIM_DT
+
+    # True while either controller still has somewhere to go
+    @property
+    def busy(self):
+        if self.pure_pursuit_active:
+            return True
+        return self.is_moving and self.target_pos is not None
+
+    # Start a regular moveToPoint towards pos
+    # With a heading, the angle enforcement variant drives to an approach point set back from the
+    # target first so it arrives facing that heading (see tracking.approach)
+    def set_target(self, pos, heading=None):
+        if self.recorder:
+            self.recorder.on_set_target(self, pos, heading)
+        if self.target_pos:
+            self.paths.finish()  # Save the path and start a new one for the new target
+        self.target_pos = pos
+        self.target_heading = heading
+        self.approach_pos = None
+        if heading is not None:
+            table = approach_table(self.turn_threshold, self.target_radius)
+            offset = table.offset(approach_angle(self.robot_pos, pos, heading), self.speed, self.turn_speed)
+            if offset > 0:
+                self.approach_pos = approach_point(pos, heading, offset)
+        self.is_moving = True
+        self.initial_pos = self.robot_pos.copy()
+        self.initial_angle = self.robot_angle
+        self.run_start_tick = self.ticks
+
+    def add_waypoint(self, pos):
+        if self.recorder:
+            self.recorder.on_add_waypoint(self, pos)
+        self.pure_pursuit_points.append(pos)
+
+    # Follow the waypoints, starting from where the robot is now
+    def start_pure_pursuit(self):
+        if self.pure_pursuit_points:
+            if self.recorder:
+                self.recorder.on_start_pure_pursuit(self)
+            waypoints = [tuple(self.robot_pos)] + self.pure_pursuit_points
+            start_speed = self.ramp.speed if self.ramp else self.pursuit_speed
+            if self.mpc is not None:
+                self.mpc.reset(start_speed if self.ramp else 0.0)
+            if self.smooth_paths:
+                self.pure_pursuit_path = generate_path(self.pure_pursuit_points, self.pursuit_speed,
+                                                       start=tuple(self.robot_pos), max_accel=self.max_accel,
+                                                       start_speed=start_speed)
+                self.planned_time = traversal_time(self.pure_pursuit_path.points,
+                                                   self.pure_pursuit_path.speeds) * SIM_DT
+            else:
+                self.pure_pursuit_path = Path(waypoints)
+                self.planned_time = None
+            self.run_start_tick = self.ticks
+            self.pure_pursuit_active = True
+
+    # Reset all necessary state variables
+    def reset(self):
+        if self.recorder:
+            self.recorder.on_reset(self)
+        self.paths.clear()  # Clear all trajectories and the current path
+        self.pure_pursuit_points.clear()  # Clear all waypoints
+        self.pure_pursuit_path = None
+        self.target_pos = None  # Reset target position
+        self.approach_pos = None
+        self.is_moving = False  # Stop any movement
+        self.pure_pursuit_active = False  # Disable pure pursuit
+        if self.ramp:
+            self.ramp.stop()
+
+    # Advance the simulation by one tick
+    # Returns False when there was nothing to do, so clocks can stop early
+    def step(self):
+        if not self.busy:
+            return False
+        finished = False
+        before = (self.robot_pos[0], self.robot_pos[1], self.robot_angle)
+
+        # The controllers steer from the localization estimate when driving off it, otherwise they
+        # move the true pose directly
+        if self.drive_on_estimate:
+            x, y, angle = self.localizer.estimate
+            pos = [x, y]
+        else:
+            pos, angle = self.robot_pos, self.robot_angle
+
+        # Move robot using Pure Pursuit if waypoints are set and active
+        if self.pure_pursuit_active:
+            start = (pos[0], pos[1], angle)
+            if self.mpc is not None:
+                pos, angle, self.is_moving = model_predictive(pos, self.pure_pursuit_path, angle, self.mpc)
+            else:
+                pos, angle, self.is_moving = pure_pursuit(
+                    pos, self.pure_pursuit_path, self.lookahead_distance, angle,
+                    self.pursuit_speed, self.turn_threshold, ramp=self.ramp)
+            if self.drive_on_estimate:
+                self._follow(start, pos, angle, turn_first=True)
+            else:
+                self.robot_angle = angle
+            if self._blocked(before):
+                # Give up on the path when it runs into an obstacle
+                self.pure_pursuit_active = False
+                self.is_moving = False
+                self.pure_pursuit_points.clear()
+                self.pure_pursuit_path = None
+                self.target_pos = None
+                self.paths.discard()
+            elif self.pure_pursuit_path.finished(pos, self.final_point_tolerance):
+                # Stop Pure Pursuit when the final point is reached
+                self.pure_pursuit_active = False
+                self.pure_pursuit_points.clear()  # Clear the Pure Pursuit points
+                self.pure_pursuit_path = None
+                if self.ramp:
+                    self.ramp.stop()
+                finished = True
+                self.target_pos = None  # Clear regular target position to prevent returning
+                self.paths.discard()  # Clear the current path
+
+        # Move robot towards the target using PID logic if not in Pure Pursuit mode
+        if not self.pure_pursuit_active and self.is_moving and self.target_pos:
+            start = (pos[0], pos[1], angle)
+            if self.approach_pos is not None:
+                target, radius = self.approach_pos, approach_radius(self.speed, self.turn_speed, self.target_radius)
+            else:
+                target, radius = self.target_pos, self.target_radius
+            reached_target, angle = move_robot_with_pid(
+                pos, target, angle, self.speed, self.turn_speed, self.turn_threshold, radius, ramp=self.ramp)
+            if self.drive_on_estimate:
+                self._follow(start, pos, angle, turn_first=False)
+            else:
+                self.robot_angle = angle
+            if self._blocked(before):
+                self.is_moving = False
+            else:
+                self.paths.append(self.robot_pos)  # Append current position to path
+            if reached_target and self.approach_pos is not None:
+                self.approach_pos = None  # Lined up, now for the target itself
+            elif reached_target:
+                self.is_moving = False  # Stop moving when target is reached
+                finished = True
+
+        if self.localizer:
+            self.localizer.update(before, (self.robot_pos[0], self.robot_pos[1], self.robot_angle))
+
+        self.ticks += 1
+        if finished:
+            self.last_run_time = (self.ticks - self.run_start_tick) * SIM_DT
+        if self.recorder:
+            self.recorder.on_tick(self)
+        return True
+
+    # Drive the true robot by the motion the controller commanded from the estimated pose
+    # pure pursuit turns before it moves, moveToPoint moves along its old heading and then turns
+    def _follow(self, start, pos, angle, turn_first):
+        forward = math.dist(start[:2], pos)
+        if turn_first:
+            self.robot_angle += angle - start[2]
+        self.robot_pos[0] += forward * math.cos(self.robot_angle)
+        self.robot_pos[1] += forward * math.sin(self.robot_angle)
+        if not turn_first:
+            self.robot_angle += angle - start[2]
+
+    # Undo this tick's move if it ran the robot into an obstacle or off the field
+    # The heading change is kept, so the robot ends up facing where it was trying to go
+    def _blocked(self, before):
+        if self.obstacles is None or not self.obstacles.collides(
+                before[0], before[1], self.robot_pos[0], self.robot_pos[1], self.robot_radius):
+            return False
+        self.robot_pos[0], self.robot_pos[1] = before[0], before[1]
+        self.collisions += 1
+        if self.ramp:
+            self.ramp.stop()
+        return True
+
+    # Run as fast as possible with no window until the robot stops or max_ticks is hit
+    # Returns the number of ticks that were run
+    def run_headless(self, max_ticks=100000):
+        start = self.ticks
+        while self.ticks - start < max_ticks and self.step():
+            pass
+        return self.ticks - start
+
+
+def parse_point(text):
+    x, y = text.split(",")
+    return (float(x), float(y))
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Run moveToPoint or pure pursuit without a window")
+    parser.add_argument("--start", type=parse_point, default=(500, 325), help="start position x,y")
+    parser.add_argument("--heading", type=float, default=0, help="start heading in degrees")
+    parser.add_argument("--target", type=parse_point, help="moveToPoint target x,y")
+    parser.add_argument("--final-heading", type=float,
+                        help="finish the moveToPoint facing this heading in degrees (angle enforcement variant)")
+    parser.add_argument("--waypoints", type=parse_point, nargs="+", help="pure pursuit waypoints x,y ...")
+    parser.add_argument("--speed", type=float, default=2, help="movement speed")
+    parser.add_argument("--turn-speed", type=float, default=0.05, help="turn speed")
+    parser.add_argument("--max-accel", type=float, help="speed change per tick, instant when not given")
+    parser.add_argument("--max-ticks", type=int, default=100000)
+    args = parser.parse_args()
+    if not args.target and not args.waypoints:
+        parser.error("give a --target or --waypoints")
+
+    sim = Simulation(args.start, math.radians(args.heading), args.speed, args.turn_speed, args.speed,
+                     max_accel=args.max_accel)
+    if args.waypoints:
+        for point in args.waypoints:
+            sim.add_waypoint(point)
+        sim.start_pure_pursuit()
+    else:
+        sim.set_target(args.target, None if args.final_heading is None else math.radians(args.final_heading))
+
+    start = time.perf_counter()
+    ticks = sim.run_headless(args.max_ticks)
+    wall_time = time.perf_counter() - start
+    print(f"Ticks: {ticks}, simulated time: {sim.sim_time:.2f}s, wall time: {wall_time * 1000:.1f}ms")
+    if sim.planned_time is not None:
+        print(f"Planned traversal time: {sim.planned_time:.2f}s")
+    if sim.last_run_time is not None:
+        print(f"Traversal time: {sim.last_run_time:.2f}s")
+    print(f"Final pose: {sim.robot_pos[0]:.1f}, {sim.robot_pos[1]:.1f}, {math.degrees(sim.robot_angle):.1f} deg")
@@ -0,0 +1,199 @@
+#----------------
+# Parallel parameter sweep for controller tuning
+# Runs every parameter configuration against a set of scenarios headless on all CPU cores,
+# streams one CSV row per (configuration, scenario) as results come in, then ranks the
+# configurations by time to target, path length and overshoot
+# Example:
+#   python -m tracking.sweep --grid speed=1,2,3,4,5 turn_speed=0.03,0.05,0.08 target_radius=10,20
+#   python -m tracking.sweep --random 500 --range lookahead_distance=20:80 pursuit_speed=2:6
+# Parameters are Simulation arguments: speed, turn_speed, pursuit_speed, lookahead_distance,
+# final_point_tolerance, turn_threshold (radians), target_radius, max_accel
+#----------------
+
+import argparse
+from concurrent.futures import ProcessPoolExecutor, as_completed
+import csv
+import itertools
+import json
+import math
+import os
+import random
+import time
+
+from tracking.simulation import Simulation
+
+# Used when no scenario file is given
+DEFAULT_SCENARIOS = [
+    {"name": "straight", "start": [100, 325], "heading": 0, "targets": [[900, 325]]},
+    {"name": "behind", "start": [500, 325], "heading": 0, "targets": [[200, 325]]},
+    {"name": "zigzag", "start": [100, 100], "heading": 90,
+     "targets": [[300, 550], [500, 100], [700, 550], [900, 100]]},
+    {"name": "pursuit_s_curve", "start": [100, 325], "heading": 0,
+     "waypoints": [[300, 500], [500, 150], [700, 500], [900, 325]]},
+    {"name": "pursuit_hairpin", "start": [100, 150], "heading": 0,
+     "waypoints": [[800, 150], [850, 300], [800, 450], [100, 450]]},
+]
+
+PARAMETERS = ("speed", "turn_speed", "pursuit_speed", "lookahead_distance", "final_point_tolerance",
+              "turn_threshold", "target_radius", "max_accel")
+METRICS = ("completed", "time", "path_length", "overshoot", "final_error", "collisions")
+
+# Run one scenario headless with the given Simulation parameters
+# Overshoot is how far the robot got past where it stopped, measured along the direction of the leg
+# (from the previous target, or the second to last waypoint), so it counts a robot that swings past
+# and comes back. Final error is how far from the last target it stopped
+# A run only counts as completed if it got through every target without hitting an obstacle and
+# stopped within the controller's tolerance of the last one
+def run_scenario(scenario, params, max_ticks=20000):
+    sim = Simulation(scenario["start"], math.radians(scenario.get("heading", 0)), **params)
+    if "waypoints" in scenario:
+        for point in scenario["waypoints"]:
+            sim.add_waypoint(tuple(point))
+        sim.start_pure_pursuit()
+        pending = []
+        goal = tuple(scenario["waypoints"][-1])
+        leg_start = tuple(scenario["waypoints"][-2]) if len(scenario["waypoints"]) > 1 else tuple(sim.robot_pos)
+        tolerance = sim.final_point_tolerance
+    else:
+        pending = [tuple(point) for point in scenario["targets"]]
+        goal = pending.pop(0)
+        leg_start = tuple(sim.robot_pos)
+        sim.set_target(goal)
+        tolerance = sim.target_radius
+
+    path_length = 0.0
+    overshoot = 0.0
+    previous = tuple(sim.robot_pos)
+
+    # Furthest the robot got along the leg's direction, compared with where it stopped at the end of it
+    def leg_overshoot(furthest):
+        dx, dy = goal[0] - leg_start[0], goal[1] - leg_start[1]
+        leg_length = math.hypot(dx, dy)
+        if leg_length == 0 or furthest == -math.inf:
+            return 0.0
+        return max(furthest - (sim.robot_pos[0] * dx + sim.robot_pos[1] * dy) / leg_length, 0.0)
+
+    furthest = -math.inf
+    while sim.ticks < max_ticks:
+        if not sim.step():
+            overshoot = max(overshoot, leg_overshoot(furthest))
+            if not pending:
+                break
+            leg_start, goal = goal, pending.pop(0)
+            furthest = -math.inf
+            sim.set_target(goal)
+            continue
+        x, y = sim.robot_pos
+        path_length += math.dist(previous, (x, y))
+        previous = (x, y)
+        dx, dy = goal[0] - leg_start[0], goal[1] - leg_start[1]
+        leg_length = math.hypot(dx, dy)
+        if leg_length > 0:
+            furthest = max(furthest, (x * dx + y * dy) / leg_length)
+
+    final_error = math.dist(sim.robot_pos, goal)
+    return {
+        "completed": int(not sim.busy and not pending and not sim.collisions and final_error <= tolerance),
+        "time": sim.sim_time,
+        "path_length": path_length,
+        "overshoot": overshoot,
+        "final_error": final_error,
+        "collisions": sim.collisions,
+    }
+
+# Run one configuration against every scenario (one process pool task)
+def run_config(config_id, params, scenarios, max_ticks):
+    rows = []
+    for scenario in scenarios:
+        row = {"config": config_id, **params, "scenario": scenario["name"]}
+        row.update(run_scenario(scenario, params, max_ticks))
+        rows.append(row)
+    return rows
+
+def parse_values(text):
+    return [float(v) for v in text.split(",")]
+
+def parse_range(text):
+    low, high = text.split(":")
+    return float(low), float(high)
+
+def parse_assignments(items, parse):
+    values = {}
+    for item in items or []:
+        name, _, value = item.partition("=")
+        if name not in PARAMETERS:
+            raise SystemExit(f"unknown parameter {name!r}, expected one of {', '.join(PARAMETERS)}")
+        values[name] = parse(value)
+    return values
+
+# Every combination of the grid values
+def grid_configs(grid):
+    names = list(grid)
+    return [dict(zip(names, combo)) for combo in itertools.product(*(grid[n] for n in names))]
+
+# count configurations drawn uniformly from the ranges
+def random_configs(ranges, count, seed=0):
+    rng = random.Random(seed)
+    return [{name: rng.uniform(low, high) for name, (low, high) in ranges.items()} for _ in range(count)]
+
+# Average each configuration over its scenarios and sort: most completed first, then fastest,
+# then least overshoot, then shortest path
+def rank(rows):
+    grouped = {}
+    for row in rows:
+        grouped.setdefault(row["config"], []).append(row)
+    summary = []
+    for config_id, group in grouped.items():
+        entry = {name: group[0][name] for name in PARAMETERS if name in group[0]}
+        entry["config"] = config_id
+        entry["completed"] = sum(r["completed"] for r in group) / len(group)
+        entry["time"] = sum(r["time"] for r in group) / len(group)
+        entry["path_length"] = sum(r["path_length"] for r in group) / len(group)
+        entry["overshoot"] = max(r["overshoot"] for r in group)
+        summary.append(entry)
+    summary.sort(key=lambda e: (-e["completed"], e["time"], e["overshoot"], e["path_length"]))
+    return summary
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Sweep controller parameters over headless scenarios")
+    parser.add_argument("--scenarios", help="JSON file with a list of scenarios (default: built-in set)")
+    parser.add_argument("--grid", nargs="+", metavar="NAME=V1,V2,...", help="grid of parameter values")
+    parser.add_argument("--random", type=int, metavar="N", help="sample N configurations from --range")
+    parser.add_argument("--range", nargs="+", metavar="NAME=LOW:HIGH", help="ranges for --random")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--max-ticks", type=int, default=20000, help="give up on a scenario after this many ticks")
+    parser.add_argument("--workers", type=int, default=os.cpu_count(), help="worker processes (default: all cores)")
+    parser.add_argument("--out", default="sweep_results.csv", help="CSV file the results are streamed to")
+    parser.add_argument("--top", type=int, default=10, help="number of ranked configurations to print")
+    args = parser.parse_args()
+
+    if args.random:
+        configs = random_configs(parse_assignments(args.range, parse_range), args.random, args.seed)
+    else:
+        configs = grid_configs(parse_assignments(args.grid, parse_values))
+    if args.scenarios:
+        with open(args.scenarios) as f:
+            scenarios = json.load(f)
+    else:
+        scenarios = DEFAULT_SCENARIOS
+    names = sorted({name for config in configs for name in config}, key=PARAMETERS.index)
+
+    start = time.perf_counter()
+    rows = []
+    with open(args.out, "w", newline="") as out, ProcessPoolExecutor(args.workers) as pool:
+        writer = csv.DictWriter(out, ["config"] + names + ["scenario"] + list(METRICS))
+        writer.writeheader()
+        futures = [pool.submit(run_config, i, config, scenarios, args.max_ticks) for i, config in enumerate(configs)]
+        for future in as_completed(futures):
+            for row in future.result():
+                writer.writerow(row)
+                rows.append(row)
+            out.flush()
+    elapsed = time.perf_counter() - start
+
+    print(f"{len(configs)} configurations x {len(scenarios)} scenarios in {elapsed:.1f}s, results in {args.out}")
+    for entry in rank(rows)[:args.top]:
+        params = ", ".join(f"{name}={entry[name]:.4g}" for name in names)
+        print(f"#{entry['config']:<4} {params}: completed {entry['completed']:.0%}, mean time {entry['time']:.2f}s, "
+              f"mean path {entry['path_length']:.0f}, max overshoot {entry['overshoot']:.1f}")
@@ -0,0 +1,480 @@
+#----------------
+# Telemetry server: streams the robot state to other tools over a local TCP or UNIX socket and
+# takes target and waypoint commands back, so external planners can drive the controllers
+# The server runs its own asyncio loop in a background thread. The window calls publish() once a
+# frame and commands() to collect what clients sent, so the simulation never waits on a socket and
+# commands are applied between ticks like clicks (and so get recorded like them too)
+# Every message is a little-endian length-prefixed struct (see the *_FORMAT constants below)
+# Commands with a point off the field or not a number are dropped and counted like malformed messages
+# Each client has one slot for the latest state instead of a queue: a slow client skips states
+# (drop-to-latest) rather than building up a backlog, and no client gets more states per second
+# than it subscribed to (or than the server's max_rate). TelemetryClient keeps the same kind of slot
+# on its side, as the socket buffers can still hold a few hundred small states
+# Addresses are "host:port" or "unix:/path/to.sock"
+# Run `python -m tracking.telemetry` for a loopback demo, or `--connect ADDRESS` to watch a window
+# started with --telemetry
+#----------------
+
+import asyncio
+from collections import deque
+import math
+import struct
+import threading
+import time
+
+from tracking.obstacles import FIELD_SIZE
+from tracking.replay import IDLE, MOVE_TO_POINT, PURE_PURSUIT, mode_of
+
+DEFAULT_ADDRESS = "127.0.0.1:8765"
+MAX_WAYPOINTS = 4096  # Waypoints sent with a state, the rest are left off
+
+# Message types, server to client
+STATE = 1
+# Client to server
+SUBSCRIBE = 16
+SET_TARGET = 17
+ADD_WAYPOINT = 18
+START_PURE_PURSUIT = 19
+RESET = 20
+
+LENGTH = struct.Struct("<H")  # Bytes in the message that follows
+# type, tick, x, y, angle, target x, target y (NaN without a target), mode, waypoint count,
+# followed by the waypoints as x, y pairs
+STATE_FORMAT = struct.Struct("<BIfffffBH")
+WAYPOINT_FORMAT = struct.Struct("<ff")
+SUBSCRIBE_FORMAT = struct.Struct("<Bf")  # type, states per second
+SET_TARGET_FORMAT = struct.Struct("<Bfff")  # type, x, y, final heading (NaN for none)
+ADD_WAYPOINT_FORMAT = struct.Struct("<Bff")  # type, x, y
+# A client with more than one state message queued for it counts as slow, so its next states wait
+# in its latest slot (and get replaced) instead of queuing up behind the one it hasn't taken yet
+STATE_BUFFER = LENGTH.size + STATE_FORMAT.size
+COMMAND_FORMATS = {SUBSCRIBE: SUBSCRIBE_FORMAT, SET_TARGET: SET_TARGET_FORMAT, ADD_WAYPOINT: ADD_WAYPOINT_FORMAT,
+                   START_PURE_PURSUIT: struct.Struct("<B"), RESET: struct.Struct("<B")}
+MODE_NAMES = {IDLE: "idle", MOVE_TO_POINT: "moveToPoint", PURE_PURSUIT: "pure pursuit"}
+
+def encode_state(sim):
+    target_x, target_y = sim.target_pos if sim.target_pos else (math.nan, math.nan)
+    waypoints = sim.pure_pursuit_points[:MAX_WAYPOINTS]
+    message = STATE_FORMAT.pack(STATE, sim.ticks, sim.robot_pos[0], sim.robot_pos[1], sim.robot_angle,
+                                target_x, target_y, mode_of(sim), len(waypoints))
+    if waypoints:
+        message += struct.pack(f"<{2 * len(waypoints)}f", *(v for point in waypoints for v in point))
+    return message
+
+def decode_state(message):
+    _, tick, x, y, angle, target_x, target_y, mode, count = STATE_FORMAT.unpack_from(message)
+    values = struct.unpack_from(f"<{2 * count}f", message, STATE_FORMAT.size)
+    return {"tick": tick, "pos": (x, y), "angle": angle,
+            "target": None if math.isnan(target_x) else (target_x, target_y), "mode": MODE_NAMES[mode],
+            "waypoints": list(zip(values[0::2], values[1::2]))}
+
+def frame(message):
+    return LENGTH.pack(len(message)) + message
+
+# False for a command with a point off the field or not a number, or an infinite final heading
+# (NaN is no heading), which would otherwise end up in the controllers and the path smoothing
+def valid_command(command):
+    kind = command[0]
+    if kind in (SET_TARGET, ADD_WAYPOINT):
+        # Comparisons with NaN are false, so NaN fails the bounds check too
+        if not (0 <= command[1] <= FIELD_SIZE[0] and 0 <= command[2] <= FIELD_SIZE[1]):
+            return False
+        if kind == SET_TARGET and math.isinf(command[3]):
+            return False
+    return True
+
+# Apply a command a client sent, on the thread that owns the simulation
+# Tools without pure pursuit (pure_pursuit=False) ignore waypoints and starting a course
+# Returns False, leaving the simulation alone, for a command valid_command() rejects
+def apply_command(sim, command, pure_pursuit=True):
+    if not valid_command(command):
+        return False
+    kind = command[0]
+    if kind == SET_TARGET:
+        _, x, y, heading = command
+        sim.set_target((x, y), None if math.isnan(heading) else heading)
+    elif kind == ADD_WAYPOINT and pure_pursuit:
+        sim.add_waypoint((command[1], command[2]))
+    elif kind == START_PURE_PURSUIT and pure_pursuit:
+        sim.start_pure_pursuit()
+    elif kind == RESET:
+        sim.reset()
+    return True
+
+def _parse_address(address):
+    if address.startswith("unix:"):
+        return None, address[len("unix:"):]
+    host, port = address.rsplit(":", 1)
+    return host, int(port)
+
+
+# One connected client: the latest state not sent yet and its rate limits
+# Nothing is sent until the client subscribes
+class _Client:
+    def __init__(self, writer, command_rate):
+        self.writer = writer
+        self.latest = None
+        self.ready = asyncio.Event()
+        self.interval = math.inf  # Seconds between states
+        self.sent = 0
+        self.dropped = 0  # States replaced before they could be sent
+        self.command_rate = command_rate
+        self.tokens = command_rate  # Token bucket for commands, refilled at command_rate per second
+        self.refilled = time.perf_counter()
+        self.handler = None  # Tasks serving the connection, waited for when the server stops
+        self.sender = None
+
+    def offer(self, message):
+        if self.interval == math.inf:
+            return
+        if self.latest is not None:
+            self.dropped += 1
+        self.latest = message
+        self.ready.set()
+
+    def allow_command(self):
+        now = time.perf_counter()
+        self.tokens = min(self.command_rate, self.tokens + (now - self.refilled) * self.command_rate)
+        self.refilled = now
+        if self.tokens < 1:
+            return False
+        self.tokens -= 1
+        return True
+
+
+class TelemetryServer:
+    def __init__(self, address=DEFAULT_ADDRESS, max_rate=60, command_rate=120, write_buffer=STATE_BUFFER):
+        self.address = address
+        self.max_rate = max_rate  # States per second any one client can get
+        self.command_rate = command_rate  # Commands per second accepted from any one client
+        self.write_buffer = write_buffer  # Bytes queued for a client before it counts as slow
+        self.clients = set()
+        self.loop = None
+        self.server = None
+        self.thread = None
+        self.received = deque()  # Commands waiting for the simulation thread, deque appends are thread safe
+        self.rejected = 0  # Commands over a client's rate limit
+        self.malformed = 0  # Messages of an unknown type or size, or with coordinates valid_command() rejects
+        self.pending = None  # Latest state not handed to the clients yet
+        self.scheduled = False
+        self.lock = threading.Lock()
+
+    # Start serving in a background thread, returns once the socket is listening
+    def start(self):
+        started = threading.Event()
+        errors = []
+
+        def run():
+            self.loop = asyncio.new_event_loop()
+            try:
+                self.server = self.loop.run_until_complete(self._listen())
+            except OSError as error:
+                errors.append(error)
+                started.set()
+                return
+            started.set()
+            self.loop.run_forever()
+            # Drop the clients before waiting for the server, since Python 3.12.1 wait_closed() also waits
+            # for every connection handler and would hang on a client that stays connected
+            self.server.close()
+            self.loop.run_until_complete(self._close_clients())
+            self.loop.run_until_complete(self.server.wait_closed())
+            self.loop.close()
+
+        self.thread = threading.Thread(target=run, name="telemetry", daemon=True)
+        self.thread.start()
+        started.wait()
+        if errors:
+            raise errors[0]
+        return self
+
+    async def _listen(self):
+        host, port = _parse_address(self.address)
+        if host is None:
+            server = await asyncio.start_unix_server(self._serve, port)
+        else:
+            server = await asyncio.start_server(self._serve, host, port)
+            # With port 0 the OS picks one, report the one it picked
+            self.address = "%s:%d" % server.sockets[0].getsockname()[:2]
+        return server
+
+    # Closing a client's connection ends its handler at the next read, which also stops its sender
+    async def _close_clients(self):
+        tasks = [task for client in self.clients for task in (client.handler, client.sender)]
+        for client in list(self.clients):
+            client.writer.close()
+        await asyncio.gather(*tasks, return_exceptions=True)
+
+    def stop(self):
+        if self.loop is not None and self.thread.is_alive():
+            self.loop.call_soon_threadsafe(self.loop.stop)
+            self.thread.join()
+
+    # Hand the latest state to every client, called from the simulation thread
+    # Only the newest state waiting for the loop is kept, so calling this often costs one encode
+    def publish(self, sim):
+        if not self.clients:
+            return
+        message = encode_state(sim)
+        with self.lock:
+            self.pending = message
+            if self.scheduled:
+                return
+            self.scheduled = True
+        self.loop.call_soon_threadsafe(self._fan_out)
+
+    def _fan_out(self):
+        with self.lock:
+            message, self.pending, self.scheduled = self.pending, None, False
+        for client in self.clients:
+            client.offer(message)
+
+    # Commands received since the last call, oldest first
+    def commands(self):
+        received = []
+        while self.received:
+            received.append(self.received.popleft())
+        return received
+
+    async def _serve(self, reader, writer):
+        writer.transport.set_write_buffer_limits(high=self.write_buffer)
+        client = _Client(writer, self.command_rate)
+        client.handler = asyncio.current_task()
+        client.sender = asyncio.ensure_future(self._send(client))
+        self.clients.add(client)
+        try:
+            while True:
+                (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+                message = await reader.readexactly(length)
+                kind = message[0] if message else None
+                if kind not in COMMAND_FORMATS or len(message) != COMMAND_FORMATS[kind].size:
+                    self.malformed += 1
+                    continue
+                command = COMMAND_FORMATS[kind].unpack(message)
+                if not valid_command(command):
+                    self.malformed += 1
+                    continue
+                if kind == SUBSCRIBE:
+                    rate = command[1]
+                    client.interval = 1 / min(rate, self.max_rate) if rate > 0 else math.inf
+                    client.ready.set()  # Wake the sender so the new rate applies now
+                elif client.allow_command():
+                    self.received.append(command)
+                else:
+                    self.rejected += 1
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        finally:
+            self.clients.discard(client)
+            client.sender.cancel()
+            writer.close()
+
+    # Send each client its latest state, no more often than its rate, waiting out a full socket
+    # buffer while newer states replace the one waiting
+    async def _send(self, client):
+        writer = client.writer
+        next_send = 0.0
+        try:
+            while True:
+                await client.ready.wait()
+                client.ready.clear()
+                wait = next_send - time.perf_counter()
+                if wait > 0:
+                    await asyncio.sleep(wait)
+                if client.latest is None or client.interval == math.inf:
+                    continue
+                message, client.latest = client.latest, None
+                writer.write(frame(message))
+                await writer.drain()
+                client.sent += 1
+                next_send = time.perf_counter() + client.interval
+        except (ConnectionError, asyncio.CancelledError):
+            pass
+
+
+# asyncio client for the server, for tools and tests
+# States are read off the socket as they arrive into a latest slot like the server's, so a client
+# that stops calling receive() for a while gets the newest state next rather than a backlog
+class TelemetryClient:
+    def __init__(self, reader, writer):
+        self.reader = reader
+        self.writer = writer
+        self.latest = None  # Newest state not returned by receive() yet, still encoded
+        self.skipped = 0  # States replaced by a newer one before receive() got to them
+        self.arrived = asyncio.Event()
+        self.reading = asyncio.ensure_future(self._read())
+
+    async def _read(self):
+        try:
+            while True:
+                (length,) = LENGTH.unpack(await self.reader.readexactly(LENGTH.size))
+                message = await self.reader.readexactly(length)
+                if self.latest is not None:
+                    self.skipped += 1
+                self.latest = message
+                self.arrived.set()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            self.arrived.set()  # Wake receive() so it can report the closed connection
+
+    @classmethod
+    async def connect(cls, address=DEFAULT_ADDRESS):
+        host, port = _parse_address(address)
+        if host is None:
+            reader, writer = await asyncio.open_unix_connection(port)
+        else:
+            reader, writer = await asyncio.open_connection(host, port)
+        return cls(reader, writer)
+
+    async def _send(self, message):
+        self.writer.write(frame(message))
+        await self.writer.drain()
+
+    async def subscribe(self, rate):
+        await self._send(SUBSCRIBE_FORMAT.pack(SUBSCRIBE, rate))
+
+    async def set_target(self, pos, heading=None):
+        await self._send(SET_TARGET_FORMAT.pack(SET_TARGET, pos[0], pos[1], math.nan if heading is None else heading))
+
+    async def add_waypoint(self, pos):
+        await self._send(ADD_WAYPOINT_FORMAT.pack(ADD_WAYPOINT, pos[0], pos[1]))
+
+    async def start_pure_pursuit(self):
+        await self._send(bytes([START_PURE_PURSUIT]))
+
+    async def reset(self):
+        await self._send(bytes([RESET]))
+
+    # Newest state from the server that hasn't been returned yet, decoded, waiting for one if needed
+    async def receive(self):
+        while self.latest is None:
+            if self.reading.done():
+                raise ConnectionError("telemetry server closed the connection")
+            self.arrived.clear()
+            await self.arrived.wait()
+        message, self.latest = self.latest, None
+        return decode_state(message)
+
+    async def close(self):
+        self.reading.cancel()
+        self.writer.close()
+        await self.writer.wait_closed()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    from tracking.simulation import Simulation, parse_point
+
+    parser = argparse.ArgumentParser(description="Telemetry loopback demo, or a client for a running window")
+    parser.add_argument("--connect", metavar="ADDRESS", help="watch a window started with --telemetry")
+    parser.add_argument("--rate", type=float, default=10, help="states per second to subscribe to")
+    parser.add_argument("--target", type=parse_point, help="send a moveToPoint target x,y")
+    parser.add_argument("--waypoints", type=parse_point, nargs="+", help="send pure pursuit waypoints x,y ...")
+    parser.add_argument("--seconds", type=float, default=5)
+    args = parser.parse_args()
+
+    async def watch(address):
+        client = await TelemetryClient.connect(address)
+        await client.subscribe(args.rate)
+        if args.target:
+            await client.set_target(args.target)
+        if args.waypoints:
+            for point in args.waypoints:
+                await client.add_waypoint(point)
+            await client.start_pure_pursuit()
+        end = time.perf_counter() + args.seconds
+        while time.perf_counter() < end:
+            state = await client.receive()
+            print(f"tick {state['tick']}: {state['pos'][0]:.1f}, {state['pos'][1]:.1f}, "
+                  f"{math.degrees(state['angle']):.1f} deg, {state['mode']}, {len(state['waypoints'])} waypoints")
+        await client.close()
+
+    if args.connect:
+        asyncio.run(watch(args.connect))
+        raise SystemExit
+
+    # Loopback: a headless simulation publishing at 60 frames a second in one thread, like the
+    # window, with a fast client, a client that stops reading for a while and one that sends commands
+    # Exits with 1 if the commands didn't come back in the states as sent
+    server = TelemetryServer("127.0.0.1:0").start()
+    sim = Simulation([500, 325], 0, 2, 0.05, pursuit_speed=4, max_accel=0.1)
+    stop = threading.Event()
+    publish_times = []
+
+    def simulate():
+        while not stop.is_set():
+            for command in server.commands():
+                apply_command(sim, command)
+            sim.step()
+            start = time.perf_counter()
+            server.publish(sim)
+            publish_times.append(time.perf_counter() - start)
+            time.sleep(1 / 60)
+
+    thread = threading.Thread(target=simulate)
+    thread.start()
+
+    failures = []
+    waypoints = [(700, 150), (850, 400), (600, 550)]
+
+    async def demo():
+        driver = await TelemetryClient.connect(server.address)
+        fast = await TelemetryClient.connect(server.address)
+        slow = await TelemetryClient.connect(server.address)
+        await fast.subscribe(30)
+        await slow.subscribe(60)
+        # Points that aren't on the field are dropped by the server
+        await driver.add_waypoint((math.nan, 100))
+        await driver.add_waypoint((1e30, 1e30))
+        for point in waypoints:
+            await driver.add_waypoint(point)
+        await driver.start_pure_pursuit()
+
+        # The fast client reads everything it is sent for two seconds
+        states = []
+        start = time.perf_counter()
+        while time.perf_counter() - start < 2:
+            states.append(await fast.receive())
+        rate = len(states) / (time.perf_counter() - start)
+        print(f"Subscribed at 30/s: got {rate:.1f} states/s, {len(frame(encode_state(sim)))} bytes each, "
+              f"tick {states[0]['tick']} -> {states[-1]['tick']}, mode {states[-1]['mode']}")
+        if states[-1]["mode"] != "pure pursuit" or states[-1]["waypoints"] != waypoints:
+            failures.append(f"expected pure pursuit along {waypoints}, got {states[-1]['mode']} along "
+                            f"{states[-1]['waypoints']}")
+        if server.malformed != 2:
+            failures.append(f"expected the 2 off-field waypoints to be dropped, {server.malformed} were")
+
+        # A target sent now shows up in the next few states
+        await driver.set_target((300, 200))
+        start = time.perf_counter()
+        while time.perf_counter() - start < 2:
+            state = await fast.receive()
+            if state["target"] == (300, 200):
+                break
+        else:
+            failures.append(f"target (300, 200) never came back, last state has {state['target']}")
+
+        # The slow client hasn't asked for anything yet, its next state should still be the latest one
+        stale = 0
+        while True:
+            state = await slow.receive()
+            if sim.ticks - state["tick"] < 10:
+                break
+            stale += 1
+        print(f"Client that stalled for 2s: {stale} stale states ({slow.skipped} older ones skipped), "
+              f"then tick {state['tick']} (simulation at {sim.ticks})")
+        for client in sorted(server.clients, key=lambda c: c.interval):
+            rate = "unsubscribed" if client.interval == math.inf else f"{1 / client.interval:.0f}/s"
+            print(f"Server side, client at {rate}: {client.sent} sent, {client.dropped} replaced by newer states")
+        for client in (driver, fast, slow):
+            await client.close()
+
+    asyncio.run(demo())
+    stop.set()
+    thread.join()
+    server.stop()
+    print(f"Publish cost in the simulation thread: {sum(publish_times) / len(publish_times) * 1e6:.1f}us mean "
+          f"over {len(publish_times)} frames")
+    for failure in failures:
+        print(f"FAILED: {failure}")
+    raise SystemExit(1 if failures else 0)
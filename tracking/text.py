@@ -0,0 +1,147 @@
+#----------------
+# Cached text rendering for the HUD, sliders and buttons
+# FontRegistry loads each font size once, TextCache keeps the most recently used rendered strings
+# (keyed by text, color and size) and evicts the oldest, and DigitAtlas holds one surface per
+# digit and punctuation glyph so numeric readouts that change every frame are blitted glyph by
+# glyph instead of being rasterized again
+# Run `python -m tracking.text` to time the HUD text with and without the caches
+#----------------
+
+from collections import OrderedDict
+
+import pygame
+
+BLACK = (0, 0, 0)
+DEFAULT_SIZE = 24
+
+# Glyphs held by the digit atlas, enough for the coordinate and slider readouts
+ATLAS_CHARS = "0123456789.,-+: s"
+
+# One pygame Font per (name, size), created the first time it is asked for
+class FontRegistry:
+    def __init__(self):
+        self.fonts = {}
+
+    def get(self, size=DEFAULT_SIZE, name=None):
+        key = (name, size)
+        font = self.fonts.get(key)
+        if font is None:
+            if not pygame.font.get_init():
+                pygame.font.init()
+            font = self.fonts[key] = pygame.font.Font(name, size)
+        return font
+
+
+# Least recently used cache of rendered text surfaces
+class TextCache:
+    def __init__(self, fonts, max_entries=256):
+        self.fonts = fonts
+        self.max_entries = max_entries
+        self.surfaces = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def render(self, text, color=BLACK, size=DEFAULT_SIZE):
+        key = (text, color, size)
+        surface = self.surfaces.get(key)
+        if surface is not None:
+            self.surfaces.move_to_end(key)
+            self.hits += 1
+            return surface
+        self.misses += 1
+        surface = self.fonts.get(size).render(text, True, color)
+        self.surfaces[key] = surface
+        if len(self.surfaces) > self.max_entries:
+            self.surfaces.popitem(last=False)
+        return surface
+
+    def clear(self):
+        self.surfaces.clear()
+
+
+# Pre-rendered glyphs per (color, size) for strings made only of ATLAS_CHARS
+# Each glyph is rendered on its own, so its width is the advance to the next glyph
+class DigitAtlas:
+    def __init__(self, fonts, chars=ATLAS_CHARS):
+        self.fonts = fonts
+        self.chars = frozenset(chars)
+        self.glyphs = {}  # (color, size) -> {char: surface}
+
+    def covers(self, text):
+        return self.chars.issuperset(text)
+
+    def _glyphs(self, color, size):
+        glyphs = self.glyphs.get((color, size))
+        if glyphs is None:
+            font = self.fonts.get(size)
+            glyphs = self.glyphs[(color, size)] = {char: font.render(char, True, color) for char in self.chars}
+        return glyphs
+
+    # Blit the string starting at pos, returns the rect it covered
+    def draw(self, screen, text, pos, color=BLACK, size=DEFAULT_SIZE):
+        glyphs = self._glyphs(color, size)
+        x, y = pos
+        blits = []
+        for char in text:
+            glyph = glyphs[char]
+            blits.append((glyph, (x, y)))
+            x += glyph.get_width()
+        rects = screen.blits(blits)
+        if not rects:
+            return pygame.Rect(pos, (0, 0))
+        return rects[0].unionall(rects[1:])
+
+
+# Shared entry point for drawing text: fixed strings come from the cache and the numeric part of
+# a readout from the atlas
+class TextRenderer:
+    def __init__(self, max_entries=256):
+        self.fonts = FontRegistry()
+        self.cache = TextCache(self.fonts, max_entries)
+        self.atlas = DigitAtlas(self.fonts)
+
+    # Draw a string that rarely changes (labels, instructions, button text)
+    def draw(self, screen, text, pos, color=BLACK, size=DEFAULT_SIZE):
+        return screen.blit(self.cache.render(text, color, size), pos)
+
+    # Draw a fixed label followed by a value that changes often, e.g. ("Robot: ", "512.3, 40.0")
+    def draw_readout(self, screen, label, value, pos, color=BLACK, size=DEFAULT_SIZE):
+        rect = self.draw(screen, label, pos, color, size)
+        if not self.atlas.covers(value):
+            return rect.union(self.draw(screen, value, rect.topright, color, size))
+        return rect.union(self.atlas.draw(screen, value, rect.topright, color, size))
+
+
+if __name__ == "__main__":
+    import os
+    import time
+
+    os.environ.setdefault("SDL_VIDEODRIVER", "dummy")
+    pygame.init()
+    screen = pygame.display.set_mode((1000, 800))
+    text = TextRenderer()
+
+    # The HUD of one window frame, with the readouts changing every frame like while the robot moves
+    def uncached(i):
+        for label, value, y in hud(i):
+            font = pygame.font.Font(None, DEFAULT_SIZE)
+            screen.blit(font.render(label + value, True, BLACK), (10, y))
+
+    def cached(i):
+        for label, value, y in hud(i):
+            text.draw_readout(screen, label, value, (10, y))
+
+    def hud(i):
+        x, y = 500 + (i * 1.7) % 300, 325 - (i * 0.9) % 200
+        return [("Robot: ", f"{x:.1f}, {y:.1f}", 10), ("Target: ", "820.0, 140.0", 40),
+                ("Cursor: ", f"{i % 1000:.1f}, {i % 650:.1f}", 70), ("Sim time: ", f"{i / 60:.2f}s", 100),
+                ("Movement Speed: ", "2.00", 670), ("Turn Speed: ", "0.05", 720),
+                ("Hold shift and click to enter pure pursuit points, press enter to run", "", 760)]
+
+    for name, draw in (("uncached", uncached), ("cached", cached)):
+        start = time.perf_counter()
+        for i in range(2000):
+            draw(i)
+        print(f"{name:>8}: {(time.perf_counter() - start) / 2000 * 1e6:.0f}us per frame of HUD text")
+    print(f"text cache: {text.cache.hits} hits, {text.cache.misses} misses, {len(text.cache.surfaces)} entries")
+    pygame.quit()
@@ -0,0 +1,78 @@
+#----------------
+# Fixed timestep clock that decouples simulation ticks from rendered frames
+# The controllers move a fixed distance per tick, so one tick is always SIM_DT of simulated time
+# speed = 1 runs in real time, speed = N runs N times faster,
+# speed = 0 (UNLIMITED) runs as many ticks as fit in each frame
+#----------------
+
+import time
+
+SIM_DT = 1 / 60  # Simulated seconds per controller tick
+UNLIMITED = 0
+
+class FixedTimestep:
+    def __init__(self, speed=1, dt=SIM_DT, frame_rate=60, max_frame_time=0.25):
+        if speed < 0:
+            raise ValueError("speed must be >= 0")
+        self.speed = speed
+        self.dt = dt
+        self.frame_time = 1 / frame_rate
+        self.max_frame_time = max_frame_time  # Cap catch-up after a stall so we don't spiral
+        self.accumulator = 0.0
+        self.ticks = 0
+        self.last_time = time.perf_counter()
+        self.frame_start = self.last_time
+        self.ticks_end = self.last_time
+        self.render_time = 0.0  # How long the caller took between the ticks and wait() last frame
+
+    @property
+    def sim_time(self):
+        return self.ticks * self.dt
+
+    # Run the ticks that are due this frame, then wait for the next frame
+    # step() is called with no arguments and may return False to stop early (nothing left to do)
+    # With wait=False the caller renders first and calls wait() itself, so the sleep can be timed apart
+    # Returns the number of ticks that were run
+    def frame(self, step, wait=True):
+        frame_start = self.frame_start = time.perf_counter()
+        elapsed = min(frame_start - self.last_time, self.max_frame_time)
+        self.last_time = frame_start
+        ran = 0
+
+        if self.speed == UNLIMITED:
+            # Use what is left of the frame after last frame's rendering for ticks, checking the clock
+            # after every tick (which costs far less than any tick) and stopping when another one as
+            # long as the last wouldn't fit, so slow ticks don't push the frame past its deadline
+            # At least one tick runs, so the simulation always moves
+            deadline = frame_start + self.frame_time - self.render_time
+            tick_start = frame_start
+            while True:
+                if step() is False:
+                    break
+                ran += 1
+                now = time.perf_counter()
+                if 2 * now - tick_start >= deadline:
+                    break
+                tick_start = now
+        else:
+            self.accumulator += elapsed * self.speed
+            while self.accumulator >= self.dt:
+                self.accumulator -= self.dt
+                if step() is False:
+                    self.accumulator = 0.0
+                    break
+                ran += 1
+
+        self.ticks += ran
+        self.ticks_end = time.perf_counter()
+        if wait:
+            self.wait()
+        return ran
+
+    # Sleep off whatever is left of the frame
+    def wait(self):
+        now = time.perf_counter()
+        self.render_time = now - self.ticks_end
+        remaining = self.frame_time - (now - self.frame_start)
+        if remaining > 0:
+            time.sleep(remaining)
@@ -0,0 +1,176 @@
+#----------------
+# Bounded trajectory storage
+# All points live in one preallocated float32 ring buffer, saved trajectories are (start, length)
+# spans into it and the oldest ones are evicted when the buffer or trajectory count runs out
+# Points are decimated as they arrive: while the robot drives straight the tail point just slides
+# forward instead of adding a new point
+# Run `python -m tracking.trajectory` for a memory comparison against plain lists
+#----------------
+
+from collections import deque
+import math
+import sys
+
+import numpy as np
+
+class TrajectoryStore:
+    def __init__(self, capacity=500000, max_trajectories=1000, tolerance=0.5):
+        if capacity < 4:
+            raise ValueError("capacity must be at least 4 points")
+        self.points = np.empty((capacity, 2), dtype=np.float32)
+        self.capacity = capacity
+        self.max_trajectories = max_trajectories
+        self.tolerance = tolerance  # Max distance a dropped point may sit off the kept segment
+        self.spans = deque()  # (start, length) of each saved trajectory, oldest first
+        self.live_start = 0
+        self.live_len = 0
+        self.direction = None  # Unit direction of the live path's last segment, used for decimation
+        self.raw_points = 0  # Points offered to the live path before decimation
+
+        # Counters so renderers can tell what changed since they last looked
+        self.generation = 0  # Bumped whenever drawn points disappear (clear, discard, eviction)
+        self.saved_total = 0  # Number of trajectories ever saved
+        self.live_serial = 0  # Bumped whenever a new live path starts
+
+    # Number of saved trajectories
+    def __len__(self):
+        return len(self.spans)
+
+    # View of the path the robot is currently driving
+    def live(self):
+        return self.points[self.live_start:self.live_start + self.live_len]
+
+    # Views of the saved trajectories, oldest first
+    def saved(self):
+        return [self.points[start:start + length] for start, length in self.spans]
+
+    # Drop saved trajectories from the front until none overlap [start, end)
+    def _evict_overlapping(self, start, end):
+        while self.spans:
+            span_start, span_len = self.spans[0]
+            if span_start >= end or span_start + span_len <= start:
+                break
+            self.spans.popleft()
+            self.generation += 1
+
+    # Make room for one more live point at the write position
+    def _reserve(self):
+        if self.live_len >= self.capacity:
+            # A single path filled the whole buffer, keep its newest half
+            keep = self.capacity // 2
+            self.points[:keep] = self.points[self.live_start + self.live_len - keep:self.live_start + self.live_len]
+            self.spans.clear()
+            self.live_start, self.live_len = 0, keep
+            self.generation += 1
+        elif self.live_start + self.live_len >= self.capacity:
+            # Out of room at the end of the buffer, move the live path to the front
+            self._evict_overlapping(0, self.live_len + 1)
+            self.points[:self.live_len] = self.points[self.live_start:self.live_start + self.live_len]
+            self.live_start = 0
+            self.live_serial += 1  # Same points, but renderers hold views of the old location
+        end = self.live_start + self.live_len
+        self._evict_overlapping(end, end + 1)
+
+    # Add a point to the live path
+    def append(self, point):
+        x, y = float(point[0]), float(point[1])
+        self.raw_points += 1
+        end = self.live_start + self.live_len
+
+        if self.live_len >= 2 and self.direction is not None:
+            anchor = self.points[end - 2]
+            vx, vy = x - anchor[0], y - anchor[1]
+            dx, dy = self.direction
+            # Replace the tail if the new point is still on the anchored segment's line
+            if vx * dx + vy * dy > 0 and abs(dx * vy - dy * vx) <= self.tolerance:
+                self.points[end - 1] = (x, y)
+                return
+
+        if self.live_len >= 1:
+            tail = self.points[end - 1]
+            length = math.hypot(x - tail[0], y - tail[1])
+            if length == 0:
+                return  # Robot didn't move
+            self.direction = ((x - tail[0]) / length, (y - tail[1]) / length)
+
+        self._reserve()
+        end = self.live_start + self.live_len
+        self.points[end] = (x, y)
+        self.live_len += 1
+
+    # Save the live path as a trajectory and start a new one
+    def finish(self):
+        if self.live_len > 1:
+            self.spans.append((self.live_start, self.live_len))
+            self.saved_total += 1
+            while len(self.spans) > self.max_trajectories:
+                self.spans.popleft()
+                self.generation += 1
+            self.live_start += self.live_len
+        self.live_len = 0
+        self.direction = None
+        self.live_serial += 1
+
+    # Throw away the live path without saving it
+    def discard(self):
+        if self.live_len:
+            self.generation += 1
+        self.live_len = 0
+        self.direction = None
+        self.live_serial += 1
+
+    # Remove the saved trajectories, keeping the live path
+    def clear_saved(self):
+        if self.spans:
+            self.generation += 1
+        self.spans.clear()
+
+    # Remove everything
+    def clear(self):
+        self.clear_saved()
+        self.discard()
+        self.live_start = 0
+
+    # Bytes used by the point data of each saved trajectory
+    def memory_per_trajectory(self):
+        return [length * self.points.itemsize * 2 for _, length in self.spans]
+
+    # Summary of how much memory the store is using
+    def memory_report(self):
+        used = sum(length for _, length in self.spans) + self.live_len
+        per_trajectory = self.memory_per_trajectory()
+        return {
+            "trajectories": len(self.spans),
+            "points": used,
+            "raw_points": self.raw_points,
+            "buffer_bytes": self.points.nbytes,
+            "used_bytes": used * self.points.itemsize * 2,
+            "mean_bytes_per_trajectory": sum(per_trajectory) / len(per_trajectory) if per_trajectory else 0,
+        }
+
+
+# Bytes used by the same path stored as a list of [x, y] lists
+def list_path_bytes(path):
+    return sys.getsizeof(path) + sum(sys.getsizeof(p) + sum(sys.getsizeof(v) for v in p) for p in path)
+
+
+if __name__ == "__main__":
+    from tracking.simulation import Simulation
+
+    rng = np.random.default_rng(0)
+    sim = Simulation([500, 325])
+    list_paths = []
+    for _ in range(100):
+        sim.set_target((float(rng.uniform(0, 1000)), float(rng.uniform(0, 650))))
+        path = []
+        while sim.step():
+            path.append(sim.robot_pos.copy())
+        list_paths.append(path)
+    sim.paths.finish()
+
+    report = sim.paths.memory_report()
+    list_bytes = [list_path_bytes(path) for path in list_paths]
+    print(f"Trajectories: {report['trajectories']}, points kept: {report['points']} of {report['raw_points']}")
+    print(f"Per trajectory as lists: {sum(list_bytes) / len(list_bytes):.0f} bytes")
+    print(f"Per trajectory in store: {report['mean_bytes_per_trajectory']:.0f} bytes "
+          f"(buffer preallocated: {report['buffer_bytes']} bytes)")
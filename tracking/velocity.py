@@ -0,0 +1,71 @@
+#----------------
+# Velocity planning with acceleration limits
+# Speeds are in units per tick and accelerations in units per tick per tick, like the controllers
+# plan_speeds runs the forward (accelerate) and backward (brake) passes over a whole path,
+# SpeedRamp applies the same limits online for moveToPoint where there is no path to plan over
+#----------------
+
+import math
+
+import numpy as np
+
+# Fastest speed at every point of a path that respects the per-point limits, the acceleration
+# limit from the start and the deceleration limit into the end
+# Both passes are prefix minimums: v_i^2 = min over j <= i of (limit_j^2 + 2a(s_i - s_j))
+def plan_speeds(points, limits, max_accel, max_decel=None, start_speed=0.0, end_speed=0.0, min_speed=0.5):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    limits = np.broadcast_to(np.asarray(limits, dtype=np.float64), (len(points),)).copy()
+    if max_decel is None:
+        max_decel = max_accel
+    if len(points) == 0:
+        return limits
+    s = np.concatenate(([0.0], np.cumsum(np.hypot(*np.diff(points, axis=0).T))))
+    limits[0] = min(limits[0], start_speed)
+    limits[-1] = min(limits[-1], end_speed)
+    squared = limits ** 2
+
+    # Forward pass: how fast the robot can be going having accelerated from every earlier point
+    # An infinite max_accel leaves only the braking limits
+    if math.isinf(max_accel):
+        forward = squared
+    else:
+        forward = 2 * max_accel * s + np.minimum.accumulate(squared - 2 * max_accel * s)
+    # Backward pass: how fast it can be going and still brake for every later point
+    remaining = s[-1] - s
+    backward = 2 * max_decel * remaining + np.minimum.accumulate((squared - 2 * max_decel * remaining)[::-1])[::-1]
+
+    speeds = np.sqrt(np.maximum(np.minimum(forward, backward), 0))
+    return np.maximum(speeds, min_speed)
+
+# Ticks needed to drive a path at the given speed per point (trapezoidal between points)
+def traversal_time(points, speeds):
+    points = np.asarray(points, dtype=np.float64).reshape(-1, 2)
+    speeds = np.asarray(speeds, dtype=np.float64)
+    if len(points) < 2:
+        return 0.0
+    lengths = np.hypot(*np.diff(points, axis=0).T)
+    mean_speed = (speeds[:-1] + speeds[1:]) / 2
+    return float(np.sum(lengths / mean_speed))
+
+# Online trapezoidal limit on forward speed
+# Each tick the speed may change by at most max_accel (or max_decel when slowing) and must stay
+# low enough to brake to a stop in the remaining distance
+class SpeedRamp:
+    def __init__(self, max_accel, max_decel=None, min_speed=0.5):
+        if max_accel <= 0:
+            raise ValueError("max_accel must be positive")
+        self.max_accel = max_accel
+        self.max_decel = max_accel if max_decel is None else max_decel
+        self.min_speed = min_speed  # Creep speed so the robot always gets all the way there
+        self.speed = 0.0
+
+    # Limit the desired speed for this tick and remember it
+    def next(self, desired, remaining):
+        braking = math.sqrt(2 * self.max_decel * max(remaining, 0))
+        speed = min(desired, self.speed + self.max_accel, braking)
+        speed = max(speed, self.speed - self.max_decel, min(self.min_speed, desired))
+        self.speed = speed
+        return speed
+
+    def stop(self):
+        self.speed = 0.0
@@ -0,0 +1,148 @@
+#----------------
+# Window widgets and drawing helpers shared by the visualization tools
+# Every draw function returns the rect it covered, for tracking.render.DirtyScreen
+#----------------
+
+import math
+
+import numpy as np
+import pygame
+
+WHITE = (255, 255, 255)
+RED = (255, 0, 0)
+BLUE = (0, 0, 255)
+GREEN = (0, 255, 0)
+BLACK = (0, 0, 0)
+GRAY = (150, 150, 150)
+ORANGE = (255, 140, 0)
+OBSTACLE_COLOR = (90, 90, 110)
+BUTTON_COLOR = (200, 200, 200)
+
+ROBOT_SIZE = 20
+
+# Button class for reset functionality
+class Button:
+    def __init__(self, x, y, w, h, text, renderer):
+        self.rect = pygame.Rect(x, y, w, h)
+        self.text = text
+        self.renderer = renderer  # tracking.text.TextRenderer
+        self.color = BUTTON_COLOR
+
+    def draw(self, screen):
+        pygame.draw.rect(screen, self.color, self.rect)
+        return self.rect.union(self.renderer.draw(screen, self.text, (self.rect.x + 10, self.rect.y + 5)))
+
+    def is_clicked(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN and self.rect.collidepoint(event.pos):
+            return True
+        return False
+
+# Slider class to manage movement and turn speed controls
+class Slider:
+    def __init__(self, x, y, w, min_val, max_val, default_val, label, renderer):
+        self.x = x
+        self.y = y
+        self.w = w
+        self.h = 20
+        self.min_val = min_val
+        self.max_val = max_val
+        self.value = default_val
+        self.label = label
+        self.renderer = renderer
+        self.slider_rect = pygame.Rect(self.x, self.y, self.w, self.h)
+        self.handle_rect = pygame.Rect(self.x + (self.value - self.min_val) / (self.max_val - self.min_val) * self.w - 5, self.y - 5, 10, 30)
+        self.handle_dragging = False
+
+    def draw(self, screen):
+        pygame.draw.rect(screen, GRAY, self.slider_rect)
+        pygame.draw.rect(screen, BLACK, self.handle_rect)
+        label_rect = self.renderer.draw_readout(screen, f"{self.label}: ", f"{self.value:.2f}",
+                                                (self.x + self.w + 20, self.y))
+        return self.slider_rect.union(self.handle_rect).union(label_rect)
+
+    def handle_event(self, event):
+        if event.type == pygame.MOUSEBUTTONDOWN:
+            if self.handle_rect.collidepoint(event.pos):
+                self.handle_dragging = True
+        elif event.type == pygame.MOUSEBUTTONUP:
+            self.handle_dragging = False
+        elif event.type == pygame.MOUSEMOTION:
+            if self.handle_dragging:
+                self.handle_rect.x = max(self.x, min(event.pos[0] - 5, self.x + self.w - 10))
+                self.value = self.min_val + (self.handle_rect.x - self.x) / self.w * (self.max_val - self.min_val)
+
+# Function to draw the robot as a square
+def draw_robot(screen, position, angle, size=ROBOT_SIZE):
+    robot_rect = pygame.Rect(0, 0, size, size)
+    robot_rect.center = position
+    pygame.draw.rect(screen, BLUE, robot_rect)
+    # Draw a line indicating robot's forward direction
+    end_pos = (
+        position[0] + size * math.cos(angle),
+        position[1] + size * math.sin(angle)
+    )
+    return robot_rect.union(pygame.draw.line(screen, GREEN, position, end_pos, 2))
+
+# draw_robot for a whole fleet: the robot is drawn once per heading step onto small surfaces, and a
+# frame is one screen.blits call with each robot's nearest heading, instead of a rect and a line each
+class RobotSprites:
+    def __init__(self, size=ROBOT_SIZE, steps=72):
+        self.steps = steps
+        self.half = size + 2  # The heading line reaches `size` from the centre
+        self.sprites = []
+        for k in range(steps):
+            sprite = pygame.Surface((2 * self.half, 2 * self.half))
+            sprite.fill(WHITE)
+            sprite.set_colorkey(WHITE)
+            draw_robot(sprite, (self.half, self.half), 2 * math.pi * k / steps, size)
+            if pygame.display.get_surface() is not None:
+                sprite = sprite.convert()  # Match the screen's pixel format so blits don't convert
+            self.sprites.append(sprite)
+
+    # Draw robots at x, y (arrays) facing heading, returns the rect covering all of them
+    def draw(self, screen, x, y, heading):
+        if len(x) == 0:
+            return None
+        index = np.rint(heading * (self.steps / (2 * math.pi))).astype(np.int64) % self.steps
+        left = (x - self.half).astype(np.int64)
+        top = (y - self.half).astype(np.int64)
+        sprites = self.sprites
+        screen.blits([(sprites[k], (l, t)) for k, l, t in zip(index.tolist(), left.tolist(), top.tolist())],
+                     doreturn=False)
+        x0, y0 = int(left.min()), int(top.min())
+        return pygame.Rect(x0, y0, int(left.max()) - x0 + 2 * self.half, int(top.max()) - y0 + 2 * self.half)
+
+# Function to draw the localization estimate as an outlined square next to the true robot
+def draw_estimate(screen, pose, size=ROBOT_SIZE):
+    x, y, angle = pose
+    estimate_rect = pygame.Rect(0, 0, size, size)
+    estimate_rect.center = (x, y)
+    pygame.draw.rect(screen, ORANGE, estimate_rect, 2)
+    end_pos = (x + size * math.cos(angle), y + size * math.sin(angle))
+    return estimate_rect.union(pygame.draw.line(screen, ORANGE, (x, y), end_pos, 2))
+
+# Function to draw a sample of the particle filter's particles as single pixels
+def draw_particles(screen, xs, ys, limit=300):
+    step = max(1, len(xs) // limit)
+    xs = xs[::step].astype(int)
+    ys = ys[::step].astype(int)
+    width, height = screen.get_size()
+    inside = (xs >= 0) & (xs < width) & (ys >= 0) & (ys < height)
+    xs, ys = xs[inside], ys[inside]
+    if len(xs) == 0:
+        return None
+    for x, y in zip(xs.tolist(), ys.tolist()):
+        screen.set_at((x, y), ORANGE)
+    left, top = int(xs.min()), int(ys.min())
+    return pygame.Rect(left, top, int(xs.max()) - left + 1, int(ys.max()) - top + 1)
+
+# Function to draw obstacle shapes (see tracking.obstacles) onto a surface
+def draw_obstacles(surface, shapes, color=OBSTACLE_COLOR):
+    for shape in shapes:
+        kind, value = next(iter(shape.items()))
+        if kind == "rect":
+            pygame.draw.rect(surface, color, pygame.Rect(*value))
+        elif kind == "circle":
+            pygame.draw.circle(surface, color, value[:2], value[2])
+        else:
+            pygame.draw.polygon(surface, color, value)